@@ -0,0 +1,70 @@
+import { spawn, ChildProcessWithoutNullStreams } from 'child_process';
+import { createInterface } from 'readline';
+import { join } from 'path';
+import { fileURLToPath } from 'url';
+import { dirname } from 'path';
+
+// One resident Python process serves every analytics provider
+let service: ChildProcessWithoutNullStreams | null = null;
+let nextRequestId = 1;
+const pending = new Map<number, { resolve: (result: any) => void; reject: (error: Error) => void }>();
+
+function startService(): ChildProcessWithoutNullStreams {
+    const __filename = fileURLToPath(import.meta.url);
+    const __dirname = dirname(__filename);
+    const pythonScript = join(__dirname, '..', '..', '..', 'packages', 'client-twitter', 'src', 'providers', 'analytics_service.py');
+
+    console.log('Python service path:', pythonScript);
+
+    const python = spawn('python3', [
+        pythonScript
+    ]);
+
+    createInterface({ input: python.stdout }).on('line', (line) => {
+        let response;
+        try {
+            response = JSON.parse(line);
+        } catch {
+            console.error('Invalid analytics service response:', line);
+            return;
+        }
+
+        const request = pending.get(response.id);
+        if (!request) {
+            return;
+        }
+        pending.delete(response.id);
+
+        if (response.error) {
+            request.reject(new Error(response.error));
+        } else {
+            request.resolve(response.result);
+        }
+    });
+
+    python.stderr.on('data', (data) => {
+        console.log(data.toString());
+    });
+
+    python.on('close', (code) => {
+        service = null;
+        for (const request of pending.values()) {
+            request.reject(new Error(`Analytics service exited with code ${code}`));
+        }
+        pending.clear();
+    });
+
+    return python;
+}
+
+export function callAnalyticsService<T = string[]>(method: string, params: Record<string, unknown> = {}): Promise<T> {
+    if (!service) {
+        service = startService();
+    }
+
+    const id = nextRequestId++;
+    return new Promise<T>((resolve, reject) => {
+        pending.set(id, { resolve, reject });
+        service.stdin.write(JSON.stringify({ id, method, params }) + '\n');
+    });
+}
@@ -0,0 +1,853 @@
+import io
+import os
+import sys
+import json
+import shutil
+import argparse
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from contextlib import ExitStack, contextmanager, redirect_stdout
+from multiprocessing import Pool
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Callable, Iterator, Optional
+
+from metric_changes import prepare_series, compute_changes, compute_changes_batch
+from dune_columns import columns_from_csv, columns_from_rows, series_from_columns
+from refresh_lock import run_single_flight
+
+DAILY_LOOKBACKS = [(1, "1d"), (7, "7d"), (30, "30d"), (90, "90d"), (365, "1y")]
+
+# Growth below these absolute amounts is treated as noise, not a regression
+BASELINE_SLACK = {"p50_ms": 1.0, "p95_ms": 2.0, "peak_mib": 0.5}
+
+
+def synthetic_daily_frame(
+    years: int, value_column: str = "value", date_column: str = "day", seed: int = 0
+) -> pd.DataFrame:
+    """Build a daily metric history shaped like a Dune result, newest row first."""
+    rng = np.random.default_rng(seed)
+    days = years * 365
+    dates = pd.date_range(end="2024-12-16", periods=days, freq="D")[::-1]
+    values = np.abs(1000 + rng.normal(0, 50, days).cumsum()) + 1
+    return pd.DataFrame(
+        {
+            date_column: dates.strftime("%Y-%m-%d 00:00:00.000 UTC"),
+            value_column: values,
+        }
+    )
+
+
+def legacy_calculate_changes(
+    df: pd.DataFrame,
+    value_column: str,
+    date_column: str,
+    lookback_periods: List[tuple],
+) -> Dict[str, float]:
+    """Reference copy of the original mask-per-horizon RoninAnalytics.calculate_changes."""
+    df = df.copy()
+    df[date_column] = pd.to_datetime(df[date_column])
+    df = df.sort_values(date_column, ascending=False)
+
+    current_value = float(df.iloc[0][value_column])
+    result = {"current": current_value}
+
+    for days, label in lookback_periods:
+        try:
+            lookup_date = df.iloc[0][date_column] - timedelta(days=days)
+            past_value = float(df[df[date_column] <= lookup_date].iloc[0][value_column])
+            change = ((current_value - past_value) / past_value) * 100
+            result[label] = change
+        except (IndexError, ValueError):
+            result[label] = None
+
+    return result
+
+
+def time_call(fn: Callable, repeat: int) -> float:
+    """Return the best wall-clock time of fn over repeat runs, in milliseconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def bench_changes(years: int, metrics: int, repeat: int) -> None:
+    """Compare the legacy and vectorized change calculators on daily series."""
+    frames = [synthetic_daily_frame(years, seed=i) for i in range(metrics)]
+
+    for frame in frames:
+        expected = legacy_calculate_changes(frame, "value", "day", DAILY_LOOKBACKS)
+        dates, values = prepare_series(frame, "value", "day")
+        actual = compute_changes(dates, values, DAILY_LOOKBACKS)
+        for label, value in expected.items():
+            assert (value is None and actual[label] is None) or np.isclose(
+                value, actual[label]
+            ), f"{label}: expected {value}, got {actual[label]}"
+
+    legacy_ms = time_call(
+        lambda: [
+            legacy_calculate_changes(f, "value", "day", DAILY_LOOKBACKS) for f in frames
+        ],
+        repeat,
+    )
+    vectorized_ms = time_call(
+        lambda: [
+            compute_changes(*prepare_series(f, "value", "day"), DAILY_LOOKBACKS)
+            for f in frames
+        ],
+        repeat,
+    )
+    series = {str(i): prepare_series(f, "value", "day") for i, f in enumerate(frames)}
+    batch_ms = time_call(lambda: compute_changes_batch(series, DAILY_LOOKBACKS), repeat)
+
+    print(
+        f"{metrics} metrics x {years * 365} daily rows, {len(DAILY_LOOKBACKS)} horizons"
+    )
+    print(f"legacy calculate_changes:      {legacy_ms:8.2f} ms")
+    print(f"prepare + compute_changes:     {vectorized_ms:8.2f} ms")
+    print(f"compute_changes_batch only:    {batch_ms:8.2f} ms")
+
+
+def bench_stats(years: int, metrics: int, window: int, repeat: int) -> None:
+    """
+    Rolling statistics per refresh: full recompute vs the incremental engine.
+
+    Every refresh of the full-recompute paths rescores the whole history;
+    the engine only absorbs the observation added since the previous run,
+    including loading and saving its persisted state.
+    """
+    from metric_stats import MetricStatsEngine, rolling_zscores
+
+    series = [
+        prepare_series(synthetic_daily_frame(years, seed=i), "value", "day")
+        for i in range(metrics)
+    ]
+
+    def pandas_recompute():
+        for _, values in series:
+            history = pd.Series(values)
+            previous = history.shift(1).rolling(window)
+            ((history - previous.mean()) / previous.std()).iloc[-1]
+            history.ewm(alpha=0.1, adjust=False).mean().iloc[-1]
+
+    def numpy_recompute():
+        for _, values in series:
+            rolling_zscores(values, window)[-1]
+
+    with tempfile.TemporaryDirectory() as state_dir:
+        state_path = os.path.join(state_dir, "stats.json")
+
+        def upto(end: int) -> Dict[str, Any]:
+            return {str(i): (d[:end], v[:end]) for i, (d, v) in enumerate(series)}
+
+        def cold():
+            if os.path.exists(state_path):
+                os.unlink(state_path)
+            MetricStatsEngine(state_path, window=window).update_many(upto(len(series[0][0])))
+
+        cold_ms = time_call(cold, repeat)
+
+        # Replay the last days one refresh at a time, with and without
+        # persisting state
+        timings = {}
+        for path in (state_path, None):
+            engine = MetricStatsEngine(path, window=window)
+            engine.update_many(upto(-repeat - 1))
+            best = float("inf")
+            for day in range(repeat, 0, -1):
+                batch = upto(-day)
+                start = time.perf_counter()
+                stats = engine.update_many(batch)
+                best = min(best, (time.perf_counter() - start) * 1000)
+            timings[path] = best
+        stats = stats[str(len(series) - 1)]
+
+        # The last update saw values[:-1], whose latest day is still open, so
+        # the engine scored values[-3] like the vectorized path
+        dates, values = series[-1]
+        expected = rolling_zscores(values, window)[-3]
+        assert np.isclose(stats.zscore, expected), (stats.zscore, expected)
+
+    print(f"{metrics} metrics x {years * 365} daily rows, window {window}")
+    print(f"pandas full recompute:         {time_call(pandas_recompute, repeat):8.2f} ms")
+    print(f"numpy full recompute:          {time_call(numpy_recompute, repeat):8.2f} ms")
+    print(f"engine cold start:             {cold_ms:8.2f} ms")
+    print(f"engine one new day, persisted: {timings[state_path]:8.2f} ms")
+    print(f"engine one new day, in memory: {timings[None]:8.2f} ms")
+
+
+def wide_result_rows(years: int, extra_columns: int) -> List[Dict[str, Any]]:
+    """Daily Dune-style rows carrying extra_columns unused numeric columns."""
+    frame = synthetic_daily_frame(years)
+    rng = np.random.default_rng(1)
+    for i in range(extra_columns):
+        frame[f"extra_{i}"] = rng.normal(0, 1000, len(frame))
+    return frame.to_dict("records")
+
+
+def traced(fn: Callable[[], Any]) -> Dict[str, float]:
+    """Wall time and tracemalloc peak of a single call."""
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"ms": elapsed * 1000, "peak_mib": peak / (1024 * 1024)}
+
+
+def bench_ingest(years: int, extra_columns: int) -> None:
+    """
+    Compare memory and time of turning a Dune result into a metric series.
+
+    Each path starts from the payload as it arrives from Dune: JSON rows with
+    every column today, or a projected CSV with only the two needed columns.
+    """
+    rows = wide_result_rows(years, extra_columns)
+    json_payload = json.dumps({"rows": rows})
+    csv_payload = pd.DataFrame(rows)[["day", "value"]].to_csv(index=False)
+    del rows
+
+    def dataframe_path():
+        frame = pd.DataFrame(json.loads(json_payload)["rows"])
+        return prepare_series(frame, "value", "day")
+
+    def rows_path():
+        parsed = json.loads(json_payload)["rows"]
+        columns = columns_from_rows(parsed, ["day"], ["value"])
+        return series_from_columns(columns, "value", "day")
+
+    def csv_path():
+        columns = columns_from_csv(io.StringIO(csv_payload), ["day"], ["value"])
+        return series_from_columns(columns, "value", "day")
+
+    expected = dataframe_path()
+    for path in (rows_path, csv_path):
+        actual = path()
+        assert np.array_equal(expected[0], actual[0])
+        assert np.allclose(expected[1], actual[1])
+
+    print(
+        f"{years * 365} daily rows x {extra_columns + 2} columns, "
+        f"JSON {len(json_payload) / 1e6:.1f} MB, projected CSV "
+        f"{len(csv_payload) / 1e6:.1f} MB"
+    )
+    for label, path in (
+        ("JSON rows -> DataFrame (today)", dataframe_path),
+        ("JSON rows -> typed columns", rows_path),
+        ("projected CSV -> typed columns", csv_path),
+    ):
+        result = traced(path)
+        print(f"{label:32} {result['ms']:8.1f} ms {result['peak_mib']:8.2f} MiB peak")
+
+
+def _lock_stress_caller(state_dir: str) -> List[str]:
+    # Imported here so each worker process loads the real state helpers
+    import gemini_analytics
+
+    lockfile_path = os.path.join(state_dir, ".news_lockfile.json")
+
+    def refresh() -> List[str]:
+        time.sleep(0.2)
+        with open(os.path.join(state_dir, "refreshes.log"), "a") as f:
+            f.write(f"{os.getpid()}\n")
+        data = [f"refreshed by {os.getpid()}"]
+        gemini_analytics.update_lockfile(lockfile_path, data)
+        return data
+
+    return run_single_flight(
+        os.path.join(state_dir, ".news_lockfile.lock"),
+        lambda: gemini_analytics.should_run(lockfile_path, 30),
+        refresh,
+        lambda: gemini_analytics.get_cached_data(lockfile_path),
+    )
+
+
+def stress_lock(callers: int) -> None:
+    """Launch many concurrent refresh callers and check only one refreshes."""
+    with tempfile.TemporaryDirectory() as state_dir:
+        start = time.perf_counter()
+        with Pool(callers) as pool:
+            results = pool.map(_lock_stress_caller, [state_dir] * callers)
+        elapsed = time.perf_counter() - start
+
+        with open(os.path.join(state_dir, "refreshes.log")) as f:
+            refreshes = f.read().split()
+
+    assert len(refreshes) == 1, f"expected 1 refresh, got {len(refreshes)}"
+    assert all(r == results[0] for r in results), "callers saw different results"
+    print(f"{callers} concurrent callers, 1 refresh, {elapsed * 1000:.0f} ms total")
+
+
+def _offline_modules():
+    """Import the analytics modules without live API keys."""
+    os.environ.setdefault("DUNE_API_KEY", "offline")
+    os.environ.setdefault("GOOGLE_GENERATIVE_AI_API_KEY", "offline")
+    import ronin_analytics
+    import gemini_analytics
+    import analytics_fakes
+
+    return ronin_analytics, gemini_analytics, analytics_fakes
+
+
+@contextmanager
+def offline_pipeline(gemini, state_dir: str) -> Iterator[None]:
+    """Route both analytics modules to a fake Gemini and a scratch state dir."""
+    ronin_analytics, gemini_analytics, _ = _offline_modules()
+    saved = [
+        (module, name, getattr(module, name))
+        for module in (ronin_analytics, gemini_analytics)
+        for name in ("genai", "STATE_DIR")
+    ] + [(gemini_analytics, "_client", gemini_analytics._client)]
+    try:
+        for module in (ronin_analytics, gemini_analytics):
+            module.genai = gemini
+            module.STATE_DIR = Path(state_dir)
+        # Drop any shared client so the next one is built from the fake
+        gemini_analytics._client = None
+        yield
+    finally:
+        for module, name, value in saved:
+            setattr(module, name, value)
+
+
+def clear_dir(path: str) -> None:
+    """Remove everything inside path, keeping the directory itself."""
+    for entry in Path(path).iterdir():
+        if entry.is_dir():
+            shutil.rmtree(entry)
+        else:
+            entry.unlink()
+
+
+def measure_stage(
+    fn: Callable[[], List[Any]],
+    iterations: int,
+    setup: Optional[Callable[[], None]] = None,
+) -> Dict[str, float]:
+    """
+    Run fn repeatedly and summarize its latency, throughput and peak memory.
+
+    setup runs before every call and is not timed. Peak memory comes from one
+    extra traced call, so tracing overhead stays out of the latencies.
+    """
+    latencies = []
+    items = 0
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        for _ in range(iterations):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            items += len(fn())
+            latencies.append(time.perf_counter() - start)
+
+        if setup is not None:
+            setup()
+        tracemalloc.start()
+        try:
+            fn()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    ms = np.array(latencies) * 1000
+    total = sum(latencies)
+    return {
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "max_ms": float(ms.max()),
+        "runs_per_s": iterations / total if total else float("inf"),
+        "items_per_s": items / total if total else float("inf"),
+        "peak_mib": peak / (1024 * 1024),
+    }
+
+
+def check_hard_stale_limit(ronin_analytics, dune, model, state_dir: str) -> None:
+    """
+    Insights past max_stale_minutes are refreshed even when no query is due.
+
+    Adaptive intervals can outgrow the hard staleness limit; the insights are
+    then no longer servable, so a scheduler with nothing due must not stop
+    the refresh either.
+    """
+    from refresh_scheduler import RefreshScheduler
+
+    clear_dir(state_dir)
+    scheduler = RefreshScheduler()
+    analytics = ronin_analytics.RoninAnalytics(dune, scheduler=scheduler)
+
+    def run() -> List[str]:
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            return ronin_analytics.rate_limited_main(
+                dune, model, ronin_analytics=analytics, scheduler=scheduler
+            )
+
+    assert run(), "first run produced no insights"
+    # Every source due in 6h, insights 5h old: past the 4h hard limit
+    for state in scheduler._sources.values():
+        state["next_due"] = time.time() + 6 * 60 * 60
+    lockfile_path = os.path.join(state_dir, ".analytics_lockfile.json")
+    with open(lockfile_path, "r") as f:
+        data = json.load(f)
+    data["last_run"] = (datetime.now() - timedelta(hours=5)).isoformat()
+    with open(lockfile_path, "w") as f:
+        json.dump(data, f)
+    assert run(), "insights past max_stale_minutes were neither refreshed nor served"
+    print("Hard staleness limit: refreshed with no query due")
+
+
+def bench_refresh(config: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+    """
+    Drive every refresh stage end to end against fake Dune and Gemini clients.
+
+    Stages run in a scratch state directory, so the real lockfiles and caches
+    are never touched. "cold" rate-limited stages start from an empty state
+    directory each call; "warm" ones are served from a fresh lockfile.
+    """
+    ronin_analytics, gemini_analytics, analytics_fakes = _offline_modules()
+
+    dune = analytics_fakes.FakeDuneClient(
+        latency=config["dune_latency"],
+        failure_rate=config["dune_failure_rate"],
+        rows=config["rows"],
+        seed=config["seed"],
+    )
+    gemini = analytics_fakes.FakeGemini(
+        latency=config["gemini_latency"],
+        failure_rate=config["gemini_failure_rate"],
+        insights=config["insights"],
+        seed=config["seed"],
+    )
+    model = gemini.GenerativeModel(ronin_analytics.SYNTHESIS_MODEL)
+    iterations = config["iterations"]
+
+    results = {}
+    with tempfile.TemporaryDirectory() as state_dir, offline_pipeline(
+        gemini, state_dir
+    ):
+
+        def cold() -> None:
+            clear_dir(state_dir)
+
+        def ronin_main() -> List[str]:
+            return ronin_analytics.rate_limited_main(dune, model)
+
+        results["generate_knowledge_base"] = measure_stage(
+            lambda: ronin_analytics.RoninAnalytics(dune).generate_knowledge_base(),
+            iterations,
+        )
+
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            metrics = ronin_analytics.RoninAnalytics(dune).generate_knowledge_base()
+        results["get_llm_synthesis"] = measure_stage(
+            lambda: ronin_analytics.get_llm_synthesis(metrics), iterations
+        )
+
+        results["get_crypto_gaming_news"] = measure_stage(
+            gemini_analytics.get_crypto_gaming_news, iterations
+        )
+
+        results["ronin.rate_limited_main cold"] = measure_stage(
+            ronin_main, iterations, setup=cold
+        )
+        results["ronin.rate_limited_main warm"] = measure_stage(ronin_main, iterations)
+
+        results["news.rate_limited_main cold"] = measure_stage(
+            gemini_analytics.rate_limited_main, iterations, setup=cold
+        )
+        results["news.rate_limited_main warm"] = measure_stage(
+            gemini_analytics.rate_limited_main, iterations
+        )
+
+        check_hard_stale_limit(ronin_analytics, dune, model, state_dir)
+
+    print(
+        f"Dune: {dune.requests} requests, {dune.failures} failed | "
+        f"Gemini: {gemini.requests} requests, {gemini.failures} failed"
+    )
+    return results
+
+
+def bench_upstream(config: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+    """
+    Knowledge base refreshes against a flaky, tail-heavy fake Dune, with the
+    plain client and through ResilientDuneClient.
+
+    Each variant gets its own fake with the same seed. With the "http"
+    transport the fakes sit behind local FakeDuneServers and both variants
+    are real DuneClients, so pooled connections, the client's own HTTP
+    retries and socket timeouts are exercised; "inprocess" calls the fakes
+    directly. Items are metric lines, so items/s also reflects lines lost to
+    failed queries.
+    """
+    ronin_analytics, _, analytics_fakes = _offline_modules()
+    from resilient_client import ResilientDuneClient, Upstream
+
+    def fake():
+        return analytics_fakes.FakeDuneClient(
+            latency=config["dune_latency"],
+            failure_rate=config["dune_failure_rate"],
+            slow_rate=config["slow_rate"],
+            slow_factor=config["slow_factor"],
+            seed=config["seed"],
+        )
+
+    upstream = Upstream(
+        "dune",
+        backoff_base=config["dune_latency"],
+        hedge_after=config["dune_latency"] * config["hedge_after"],
+        failure_threshold=config["failure_threshold"],
+    )
+
+    results = {}
+    with ExitStack() as stack:
+        fakes = {"plain": fake(), "resilient": fake()}
+        servers = {}
+        if config["transport"] == "http":
+            from dune_client.client import DuneClient
+
+            # Slow outliers outlast the timeout, so they fail on the socket
+            timeout = config["request_timeout"] or (
+                config["dune_latency"] * config["slow_factor"] / 2
+            )
+            clients = {}
+            for name, backend in fakes.items():
+                servers[name] = stack.enter_context(
+                    analytics_fakes.FakeDuneServer(backend)
+                )
+                clients[name] = DuneClient(
+                    "offline", base_url=servers[name].url, request_timeout=timeout
+                )
+        else:
+            clients = dict(fakes)
+        clients["resilient"] = ResilientDuneClient(clients["resilient"], upstream)
+
+        for name, client in clients.items():
+            results[f"generate_knowledge_base {name}"] = measure_stage(
+                lambda: ronin_analytics.RoninAnalytics(client).generate_knowledge_base(),
+                config["iterations"],
+            )
+
+        summary = []
+        for name, backend in fakes.items():
+            line = f"{name}: {backend.requests} requests, {backend.failures} failed"
+            if name in servers:
+                line += f", {servers[name].connections} connections"
+            summary.append(line)
+        print(f"Dune over {config['transport']} | " + " | ".join(summary))
+    return results
+
+
+# Modules a cached run should never import
+HEAVY_MODULES = (
+    "numpy",
+    "pandas",
+    "google.generativeai",
+    "google.genai",
+    "dune_client",
+)
+
+# Entry point module and the lockfile its skip path serves
+STARTUP_ENTRY_POINTS = {
+    "ronin_analytics": ".analytics_lockfile.json",
+    "gemini_analytics": ".news_lockfile.json",
+}
+
+
+def import_time_ms(module: str, env: Dict[str, str]) -> float:
+    """Cumulative import time of module in a fresh interpreter, from -X importtime."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    for line in reversed(result.stderr.splitlines()):
+        fields = [field.strip() for field in line.split("|")]
+        if len(fields) == 3 and fields[2] == module:
+            return int(fields[1]) / 1000
+    raise RuntimeError(f"no import time reported for {module}")
+
+
+def run_ms(argv: List[str], env: Dict[str, str]) -> float:
+    """Wall time of a fresh interpreter running argv to completion."""
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, *argv],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        check=True,
+    )
+    return (time.perf_counter() - start) * 1000
+
+
+def bench_startup(repeat: int) -> Dict[str, Dict[str, float]]:
+    """
+    Cold-start latency of both entry points.
+
+    Each measurement runs in a fresh interpreter: the module import alone,
+    and a full `python <module>.py` run against a fresh lockfile, i.e. the
+    skip path that serves cached insights. A bare interpreter start is
+    measured as the floor. Also reports which heavy modules the skip path
+    imported, which should be none.
+    """
+    ronin_analytics, gemini_analytics, _ = _offline_modules()
+    here = Path(__file__).parent
+    results: Dict[str, Dict[str, float]] = {}
+
+    with tempfile.TemporaryDirectory() as state_dir:
+        env = dict(os.environ, ANALYTICS_STATE_DIR=state_dir)
+        for module in (ronin_analytics, gemini_analytics):
+            lockfile = STARTUP_ENTRY_POINTS[module.__name__]
+            module.update_lockfile(str(Path(state_dir) / lockfile), ["cached insight"])
+
+        results["python"] = {
+            "run_ms": float(
+                np.median([run_ms(["-c", "pass"], env) for _ in range(repeat)])
+            )
+        }
+        for name in STARTUP_ENTRY_POINTS:
+            results[name] = {
+                "import_ms": float(
+                    np.median([import_time_ms(name, env) for _ in range(repeat)])
+                ),
+                "run_ms": float(
+                    np.median(
+                        [run_ms([str(here / f"{name}.py")], env) for _ in range(repeat)]
+                    )
+                ),
+            }
+
+            # Run the skip path in-process to see what it pulled in
+            probe = subprocess.run(
+                [
+                    sys.executable,
+                    "-c",
+                    "import runpy, sys\n"
+                    "sys.stdout = sys.stderr\n"
+                    f"runpy.run_path({str(here / f'{name}.py')!r}, run_name='__main__')\n"
+                    "sys.stdout = sys.__stdout__\n"
+                    f"print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))",
+                ],
+                env=env,
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+            loaded = probe.stdout.split()
+            results[name]["heavy_modules"] = float(len(loaded))
+            if loaded:
+                print(f"{name} skip path imported: {', '.join(loaded)}")
+
+    return results
+
+
+def print_startup(results: Dict[str, Dict[str, float]]) -> None:
+    print(f"{'entry point':20} {'import ms':>10} {'run ms':>10} {'heavy':>6}")
+    for name, r in results.items():
+        import_ms = f"{r['import_ms']:10.1f}" if "import_ms" in r else f"{'-':>10}"
+        heavy = f"{r['heavy_modules']:6.0f}" if "heavy_modules" in r else f"{'-':>6}"
+        print(f"{name:20} {import_ms} {r['run_ms']:10.1f} {heavy}")
+
+
+def print_stages(results: Dict[str, Dict[str, float]]) -> None:
+    print(
+        f"{'stage':32} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+        f"{'runs/s':>8} {'items/s':>9} {'peak MiB':>9}"
+    )
+    for stage, r in results.items():
+        print(
+            f"{stage:32} {r['p50_ms']:9.1f} {r['p95_ms']:9.1f} {r['p99_ms']:9.1f} "
+            f"{r['runs_per_s']:8.2f} {r['items_per_s']:9.1f} {r['peak_mib']:9.2f}"
+        )
+
+
+def check_baseline(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Any],
+    config: Dict[str, Any],
+    tolerance: float,
+) -> List[str]:
+    """
+    Compare results against a recorded baseline.
+
+    Returns:
+        List[str]: Stages whose p50, p95 or peak memory grew beyond tolerance
+        and beyond BASELINE_SLACK
+    """
+    if baseline["config"] != config:
+        print("Warning: baseline was recorded with a different configuration")
+
+    regressions = []
+    for stage, current in results.items():
+        recorded = baseline["stages"].get(stage)
+        if recorded is None:
+            continue
+        for key, slack in BASELINE_SLACK.items():
+            limit = max(recorded[key] * (1 + tolerance), recorded[key] + slack)
+            if current[key] > limit:
+                regressions.append(
+                    f"{stage} {key}: {current[key]:.2f} vs baseline {recorded[key]:.2f}"
+                )
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ronin analytics benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    changes_parser = subparsers.add_parser(
+        "changes", help="legacy vs vectorized calculate_changes"
+    )
+    changes_parser.add_argument("--years", type=int, default=5)
+    changes_parser.add_argument("--metrics", type=int, default=8)
+    changes_parser.add_argument("--repeat", type=int, default=5)
+
+    ingest_parser = subparsers.add_parser(
+        "ingest", help="memory of DataFrame vs columnar Dune ingestion"
+    )
+    ingest_parser.add_argument("--years", type=int, default=5)
+    ingest_parser.add_argument("--extra-columns", type=int, default=12)
+
+    stats_parser = subparsers.add_parser(
+        "stats", help="full recompute vs incremental rolling statistics"
+    )
+    stats_parser.add_argument("--years", type=int, default=12)
+    stats_parser.add_argument("--metrics", type=int, default=8)
+    stats_parser.add_argument("--window", type=int, default=30)
+    stats_parser.add_argument("--repeat", type=int, default=5)
+
+    stress_parser = subparsers.add_parser(
+        "lock-stress", help="concurrent callers against single-flight refresh"
+    )
+    stress_parser.add_argument("--callers", type=int, default=32)
+
+    refresh_parser = subparsers.add_parser(
+        "refresh", help="end-to-end refresh stages against fake Dune and Gemini"
+    )
+    refresh_parser.add_argument("--iterations", type=int, default=20)
+    refresh_parser.add_argument("--rows", type=int, default=365)
+    refresh_parser.add_argument("--insights", type=int, default=4)
+    refresh_parser.add_argument("--dune-latency", type=float, default=0.05)
+    refresh_parser.add_argument("--dune-failure-rate", type=float, default=0.0)
+    refresh_parser.add_argument("--gemini-latency", type=float, default=0.1)
+    refresh_parser.add_argument("--gemini-failure-rate", type=float, default=0.0)
+    refresh_parser.add_argument("--seed", type=int, default=0)
+    refresh_parser.add_argument(
+        "--record-baseline", metavar="PATH", help="write results as a baseline"
+    )
+    refresh_parser.add_argument(
+        "--baseline", metavar="PATH", help="fail on regressions against a baseline"
+    )
+    refresh_parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="allowed fractional slowdown before a stage counts as a regression",
+    )
+
+    upstream_parser = subparsers.add_parser(
+        "upstream", help="plain vs resilient Dune client under failures and tail latency"
+    )
+    upstream_parser.add_argument("--iterations", type=int, default=20)
+    upstream_parser.add_argument("--dune-latency", type=float, default=0.05)
+    upstream_parser.add_argument("--dune-failure-rate", type=float, default=0.1)
+    upstream_parser.add_argument("--slow-rate", type=float, default=0.05)
+    upstream_parser.add_argument("--slow-factor", type=float, default=20.0)
+    upstream_parser.add_argument(
+        "--hedge-after",
+        type=float,
+        default=3.0,
+        help="hedge delay as a multiple of the mean Dune latency",
+    )
+    upstream_parser.add_argument("--failure-threshold", type=int, default=5)
+    upstream_parser.add_argument(
+        "--transport",
+        choices=("http", "inprocess"),
+        default="http",
+        help="serve the fakes over local HTTP servers or call them in process",
+    )
+    upstream_parser.add_argument(
+        "--request-timeout",
+        type=float,
+        default=None,
+        help="DuneClient socket timeout over http; half a slow outlier by default",
+    )
+    upstream_parser.add_argument("--seed", type=int, default=0)
+
+    startup_parser = subparsers.add_parser(
+        "startup", help="cold-start import and cached-run latency of both entry points"
+    )
+    startup_parser.add_argument("--repeat", type=int, default=5)
+
+    args = parser.parse_args()
+    if args.benchmark == "changes":
+        bench_changes(args.years, args.metrics, args.repeat)
+    elif args.benchmark == "stats":
+        bench_stats(args.years, args.metrics, args.window, args.repeat)
+    elif args.benchmark == "ingest":
+        bench_ingest(args.years, args.extra_columns)
+    elif args.benchmark == "lock-stress":
+        stress_lock(args.callers)
+    elif args.benchmark == "startup":
+        print_startup(bench_startup(args.repeat))
+    elif args.benchmark == "upstream":
+        config = {
+            key: getattr(args, key)
+            for key in (
+                "iterations",
+                "dune_latency",
+                "dune_failure_rate",
+                "slow_rate",
+                "slow_factor",
+                "hedge_after",
+                "failure_threshold",
+                "transport",
+                "request_timeout",
+                "seed",
+            )
+        }
+        print_stages(bench_upstream(config))
+    elif args.benchmark == "refresh":
+        config = {
+            key: getattr(args, key)
+            for key in (
+                "iterations",
+                "rows",
+                "insights",
+                "dune_latency",
+                "dune_failure_rate",
+                "gemini_latency",
+                "gemini_failure_rate",
+                "seed",
+            )
+        }
+        results = bench_refresh(config)
+        print_stages(results)
+
+        if args.record_baseline:
+            with open(args.record_baseline, "w") as f:
+                json.dump({"config": config, "stages": results}, f, indent=2)
+            print(f"Baseline written to {args.record_baseline}")
+
+        if args.baseline:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+            regressions = check_baseline(results, baseline, config, args.tolerance)
+            for regression in regressions:
+                print(f"REGRESSION {regression}")
+            if regressions:
+                sys.exit(1)
+            print("No regressions against baseline")
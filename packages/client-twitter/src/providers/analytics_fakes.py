@@ -0,0 +1,468 @@
+import io
+import re
+import json
+import time
+import random
+import sys
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+from typing import List, Dict, Any, Optional
+
+from metric_changes import DUNE_DATE_FORMAT
+from ronin_analytics import (
+    RON_PRICE_QUERY_ID,
+    RON_PRICE_HISTORY_QUERY_ID,
+    WAA_QUERY_ID,
+    DAILY_ADDRESSES_QUERY_ID,
+    GAME_ACTIVITY_QUERY_ID,
+    TVL_QUERY_ID,
+    FEES_QUERY_ID,
+    TRANSACTIONS_QUERY_ID,
+)
+
+GAMES = [
+    "Pixel",
+    "Lumiterra",
+    "Wild Forest",
+    "The Machines Arena",
+    "Axie Infinity",
+    "Apeiron",
+    "Ragnarok",
+    "Kaidro",
+]
+
+
+class FakeUpstreamError(RuntimeError):
+    """Failure injected by a fake upstream client."""
+
+
+class _Upstream:
+    """Latency and failure injection shared by the fake clients."""
+
+    def __init__(
+        self,
+        latency: float,
+        jitter: float,
+        failure_rate: float,
+        seed: int,
+        slow_rate: float = 0.0,
+        slow_factor: float = 10.0,
+    ):
+        """
+        Args:
+            latency: Mean seconds each request takes
+            jitter: Fraction of latency the actual delay varies by
+            failure_rate: Probability that a request raises FakeUpstreamError
+            seed: Seed for the latency and failure draws
+            slow_rate: Probability that a request is a tail-latency outlier
+            slow_factor: How many times slower an outlier request is
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.slow_rate = slow_rate
+        self.slow_factor = slow_factor
+        self.requests = 0
+        self.failures = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def request(self, what: str) -> None:
+        """Sleep for one request's latency, then fail with failure_rate."""
+        with self._lock:
+            self.requests += 1
+            delay = self.latency * self._rng.uniform(1 - self.jitter, 1 + self.jitter)
+            if self._rng.random() < self.slow_rate:
+                delay *= self.slow_factor
+            failed = self._rng.random() < self.failure_rate
+            if failed:
+                self.failures += 1
+        time.sleep(max(0.0, delay))
+        if failed:
+            raise FakeUpstreamError(f"injected failure for {what}")
+
+
+def _series_rows(
+    rows: int,
+    step_days: int,
+    date_column: str,
+    value_column: str,
+    start: float,
+    rng: random.Random,
+) -> List[Dict[str, Any]]:
+    # Newest row first, as Dune returns them
+    now = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    value = start
+    result = []
+    for i in range(rows):
+        value = abs(value * (1 + rng.gauss(0, 0.02))) + 1
+        result.append(
+            {
+                date_column: (now - timedelta(days=i * step_days)).strftime(
+                    DUNE_DATE_FORMAT
+                ),
+                value_column: value,
+            }
+        )
+    return result
+
+
+def ronin_rows(query_id: int, rows: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    Build result rows shaped like the Dune query behind each Ronin analyzer.
+
+    Args:
+        query_id: One of the knowledge base query IDs
+        rows: Number of rows for time series queries
+        seed: Seed for the generated values
+    """
+    rng = random.Random(seed * 1_000_003 + query_id)
+
+    if query_id == RON_PRICE_QUERY_ID:
+        return [{"ron_price": 2.5 + rng.random()}]
+    if query_id == RON_PRICE_HISTORY_QUERY_ID:
+        return _series_rows(rows, 1, "time", "price", 2.5, rng)
+    if query_id == WAA_QUERY_ID:
+        return _series_rows(rows, 1, "time", "users_moving_average", 800_000, rng)
+    if query_id == DAILY_ADDRESSES_QUERY_ID:
+        return _series_rows(rows, 1, "day", "receiving_addresses", 60_000, rng)
+    if query_id == TVL_QUERY_ID:
+        return _series_rows(rows, 1, "date", "tvl", 250_000_000, rng)
+    if query_id == FEES_QUERY_ID:
+        return _series_rows(rows, 7, "week", "tx_fees_RON", 40_000, rng)
+    if query_id == TRANSACTIONS_QUERY_ID:
+        result = _series_rows(rows, 7, "week", "tx_count", 5_000_000, rng)
+        result[0].update(
+            {
+                "cumulative_transactions": 2_500_000_000,
+                "cu_address_count": 30_000_000,
+                "cu_address_count_30d": 1_800_000,
+            }
+        )
+        return result
+    if query_id == GAME_ACTIVITY_QUERY_ID:
+        return [
+            {
+                "project": game,
+                "num_of_accounts_1d": rng.randint(1_000, 500_000),
+                "diff_1d": rng.uniform(-0.2, 0.2),
+                "num_of_accounts_7d": rng.randint(5_000, 1_500_000),
+                "diff_7d": rng.uniform(-0.3, 0.3),
+                "num_of_accounts_30d": rng.randint(10_000, 3_000_000),
+                "diff_30d": rng.uniform(-0.5, 0.5),
+            }
+            for game in GAMES
+        ]
+    raise FakeUpstreamError(f"unknown query {query_id}")
+
+
+class FakeDuneClient(_Upstream):
+    """
+    Offline stand-in for DuneClient.
+
+    Serves the calls RoninAnalytics and DuneResultCache make, with rows built
+    by ronin_rows. Rows and CSV payloads are built once per request shape so
+    their generation does not show up in the measurements.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.5,
+        jitter: float = 0.2,
+        failure_rate: float = 0.0,
+        rows: int = 365,
+        seed: int = 0,
+        slow_rate: float = 0.0,
+        slow_factor: float = 10.0,
+    ):
+        """
+        Args:
+            latency: Mean seconds per Dune request
+            jitter: Fraction of latency the actual delay varies by
+            failure_rate: Probability that a request fails
+            rows: Number of rows returned by time series queries
+            seed: Seed for latency, failures and generated rows
+            slow_rate: Probability that a request is a tail-latency outlier
+            slow_factor: How many times slower an outlier request is
+        """
+        super().__init__(latency, jitter, failure_rate, seed, slow_rate, slow_factor)
+        self.rows = rows
+        self.seed = seed
+        self._results: Dict[int, List[Dict[str, Any]]] = {}
+        self._csv: Dict[tuple, bytes] = {}
+
+    def _rows(self, query_id: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            if query_id not in self._results:
+                self._results[query_id] = ronin_rows(query_id, self.rows, self.seed)
+            return self._results[query_id]
+
+    def get_latest_result(self, query_id: int) -> SimpleNamespace:
+        self.request(f"query {query_id}")
+        return SimpleNamespace(
+            execution_id=f"fake-{query_id}-{self.seed}",
+            times=SimpleNamespace(execution_ended_at=datetime.now()),
+            result=SimpleNamespace(rows=self._rows(query_id)),
+        )
+
+    def download_csv(
+        self,
+        query_id: int,
+        columns: Optional[List[str]] = None,
+        filters: Optional[str] = None,
+        **kwargs,
+    ) -> SimpleNamespace:
+        """Serve rows as CSV, honouring columns and simple "col >= 'date'" filters."""
+        self.request(f"query {query_id} csv")
+        key = (query_id, tuple(columns or ()), filters)
+        if key not in self._csv:
+            frame = pd.DataFrame(self._rows(query_id))
+            if filters:
+                match = re.fullmatch(r"(\w+) >= '([^']+)'", filters)
+                if match is None:
+                    raise FakeUpstreamError(f"unsupported filter {filters!r}")
+                column, bound = match.groups()
+                frame = frame[frame[column] >= bound]
+            if columns:
+                frame = frame[columns]
+            self._csv[key] = frame.to_csv(index=False).encode()
+        return SimpleNamespace(data=io.BytesIO(self._csv[key]))
+
+    def _get(self, route: str, params: Optional[Dict[str, Any]] = None) -> Dict:
+        query_id = int(route.split("/")[2])
+        self.request(f"query {query_id} metadata")
+        return {
+            "execution_id": f"fake-{query_id}-{self.seed}",
+            "execution_ended_at": datetime.now().isoformat(),
+        }
+
+
+class _DuneRequestHandler(BaseHTTPRequestHandler):
+    """Serves the Dune API routes DuneClient reads from a FakeDuneClient."""
+
+    # Keep-alive, so clients can reuse their pooled connections
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _result(self, query_id: int, rows: List[Dict[str, Any]]) -> bytes:
+        fake: FakeDuneClient = self.server.fake
+        # Dune timestamps are timezone aware
+        now = datetime.now(timezone.utc).isoformat()
+        columns = list(rows[0]) if rows else []
+        return json.dumps(
+            {
+                "execution_id": f"fake-{query_id}-{fake.seed}",
+                "query_id": query_id,
+                "state": "QUERY_STATE_COMPLETED",
+                "submitted_at": now,
+                "execution_started_at": now,
+                "execution_ended_at": now,
+                "result": {
+                    "rows": rows,
+                    "metadata": {
+                        "column_names": columns,
+                        "column_types": ["varchar"] * len(columns),
+                        "total_row_count": len(rows),
+                        "result_set_bytes": 0,
+                        "datapoint_count": len(rows) * len(columns),
+                        "execution_time_millis": 0,
+                    },
+                },
+            }
+        ).encode()
+
+    def do_GET(self) -> None:
+        fake: FakeDuneClient = self.server.fake
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        parts = url.path.strip("/").split("/")
+        try:
+            # /api/v1/query/{id}/results[/csv] and /api/v1/execution/{id}/results
+            if parts[2:3] == ["query"] and parts[4:] == ["results", "csv"]:
+                columns = params["columns"].split(",") if "columns" in params else None
+                result = fake.download_csv(
+                    int(parts[3]), columns=columns, filters=params.get("filters")
+                )
+                self._send(200, result.data.getvalue(), "text/csv")
+            elif parts[2:3] == ["query"] and parts[4:] == ["results"]:
+                query_id = int(parts[3])
+                fake.request(f"query {query_id} metadata")
+                limit = int(params.get("limit", 0)) or None
+                self._send(
+                    200, self._result(query_id, fake._rows(query_id)[:limit]),
+                    "application/json",
+                )
+            elif parts[2:3] == ["execution"] and parts[4:] == ["results"]:
+                query_id = int(parts[3].split("-")[1])
+                fake.request(f"query {query_id}")
+                self._send(
+                    200, self._result(query_id, fake._rows(query_id)),
+                    "application/json",
+                )
+            else:
+                self._send(404, b'{"error": "not found"}', "application/json")
+        except FakeUpstreamError as e:
+            body = json.dumps({"error": str(e)}).encode()
+            self._send(503, body, "application/json")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up on a slow response
+            pass
+
+
+class _CountingHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def process_request(self, request, client_address) -> None:
+        with self.lock:
+            self.connections += 1
+        super().process_request(request, client_address)
+
+    def handle_error(self, request, client_address) -> None:
+        # Clients hang up on responses that outlast their timeout
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class FakeDuneServer:
+    """
+    Local HTTP server speaking the Dune API routes a DuneClient reads.
+
+    Requests are served by a FakeDuneClient, so latency, tail outliers and
+    failures are injected the same way, but over real sockets: injected
+    failures come back as HTTP 503, slow responses run into the client's
+    request timeout, and every accepted TCP connection is counted so
+    connection reuse shows up. Use as a context manager.
+    """
+
+    def __init__(self, fake: "FakeDuneClient"):
+        """
+        Args:
+            fake: Serves the rows and injects latency and failures
+        """
+        self.fake = fake
+        self._server = _CountingHTTPServer(("127.0.0.1", 0), _DuneRequestHandler)
+        self._server.fake = fake
+        self._server.connections = 0
+        self._server.lock = threading.Lock()
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        """Base URL to pass to DuneClient as base_url."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def connections(self) -> int:
+        """TCP connections accepted so far."""
+        return self._server.connections
+
+    def __enter__(self) -> "FakeDuneServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class FakeGemini(_Upstream):
+    """
+    Offline stand-in for both Gemini SDK modules.
+
+    Exposes GenerativeModel (google.generativeai, used by ronin_analytics) and
+    Client (google.genai, used by gemini_analytics), so it can replace the
+    genai attribute of either module.
+    """
+
+    def __init__(
+        self,
+        latency: float = 2.0,
+        jitter: float = 0.2,
+        failure_rate: float = 0.0,
+        insights: int = 4,
+        seed: int = 0,
+    ):
+        """
+        Args:
+            latency: Mean seconds per generation request
+            jitter: Fraction of latency the actual delay varies by
+            failure_rate: Probability that a request fails
+            insights: Insights returned per synthesis section and news category
+            seed: Seed for latency and failures
+        """
+        super().__init__(latency, jitter, failure_rate, seed)
+        self.insights = insights
+
+    def configure(self, **kwargs) -> None:
+        pass
+
+    def GenerationConfig(self, **kwargs) -> SimpleNamespace:
+        return SimpleNamespace(**kwargs)
+
+    def GenerativeModel(self, model_name: str, **kwargs) -> SimpleNamespace:
+        def generate_content(
+            prompt: str, generation_config: Any = None, **kwargs
+        ) -> SimpleNamespace:
+            self.request(model_name)
+            lines = [
+                f"Metric {i + 1} rose 4.2% over 7 days, extending its 30 day uptrend."
+                for i in range(self.insights)
+            ]
+            mime_type = getattr(generation_config, "response_mime_type", None)
+            if mime_type != "application/json":
+                return SimpleNamespace(text="\n".join(lines))
+
+            # One set of insights per section named in a structured prompt
+            sections = re.findall(r"^Section: (.+)$", prompt, re.MULTILINE)
+            return SimpleNamespace(
+                text=json.dumps(
+                    {
+                        "insights": [
+                            {"section": section, "insight": line}
+                            for section in sections
+                            for line in lines
+                        ]
+                    }
+                )
+            )
+
+        return SimpleNamespace(generate_content=generate_content)
+
+    def Client(self, **kwargs) -> SimpleNamespace:
+        def send_message(prompt: str) -> SimpleNamespace:
+            self.request("news chat")
+            # Answer for the numbered categories the prompt asks about
+            categories = re.findall(r"^\s*\d+\. (.+)$", prompt, re.MULTILINE)
+            text = "\n\n".join(
+                f"**[{category}]**\n"
+                + "\n".join(
+                    f"* **Headline {i + 1}:** Project volume up 12% week over week."
+                    for i in range(self.insights)
+                )
+                for category in categories
+            )
+            part = SimpleNamespace(text=text)
+            return SimpleNamespace(
+                candidates=[SimpleNamespace(content=SimpleNamespace(parts=[part]))]
+            )
+
+        def create(**kwargs) -> SimpleNamespace:
+            return SimpleNamespace(send_message=send_message)
+
+        return SimpleNamespace(chats=SimpleNamespace(create=create))
+
@@ -0,0 +1,208 @@
+import os
+import sys
+import json
+import argparse
+import threading
+import socketserver
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Callable, Optional, TextIO
+
+from dune_client.client import DuneClient
+import google.generativeai as genai
+
+import instrumentation
+import ronin_analytics
+import gemini_analytics
+from dune_cache import DuneResultCache
+from metric_store import MetricStore
+from game_history import GameHistory
+from metric_stats import MetricStatsEngine
+from llm_cache import LLMResponseCache
+from news_dedup import NewsDedupIndex
+from insight_store import InsightStore
+from refresh_scheduler import RefreshScheduler
+from resilient_client import ResilientDuneClient
+
+
+class AnalyticsService:
+    """
+    Long-running analytics backend that keeps clients and caches warm.
+
+    Requests and responses are JSON objects, one per line:
+        {"id": 1, "method": "generate_knowledge_base", "params": {}}
+        {"id": 1, "result": [...]} or {"id": 1, "error": "..."}
+    """
+
+    def __init__(self):
+        state_dir = ronin_analytics.STATE_DIR
+
+        genai.configure(api_key=ronin_analytics.GOOGLE_API_KEY)
+        self.model = genai.GenerativeModel("gemini-1.5-pro-latest")
+        self.dune = ResilientDuneClient(DuneClient(ronin_analytics.DUNE_API_KEY))
+        # Each Dune query and the news feed refresh on their own cadence;
+        # news keeps the old 30 minute floor since every search differs
+        self.scheduler = RefreshScheduler(
+            str(state_dir / ".refresh_schedule.json"),
+            limits={gemini_analytics.NEWS_SOURCE: (30 * 60, 6 * 60 * 60)},
+        )
+        self.ronin = ronin_analytics.RoninAnalytics(
+            self.dune,
+            result_cache=DuneResultCache(self.dune, str(state_dir / ".dune_cache")),
+            metric_store=MetricStore(str(state_dir / ".metric_store")),
+            scheduler=self.scheduler,
+            metric_stats=MetricStatsEngine(str(state_dir / ".metric_stats.json")),
+            game_history=GameHistory(str(state_dir / ".game_history.json")),
+        )
+
+        self.llm_cache = LLMResponseCache(str(state_dir / ".llm_cache.json"))
+        self.news_index = NewsDedupIndex(str(state_dir / ".news_dedup.json"))
+        # Shared by every service process; readers never wait on a refresh
+        self.store = InsightStore(str(state_dir / ".insights.db"))
+
+        # RoninAnalytics holds per-refresh prefetch state
+        self._ronin_lock = threading.Lock()
+
+        self.methods: Dict[str, Callable[..., Any]] = {
+            "ping": lambda: "pong",
+            "generate_knowledge_base": self.generate_knowledge_base,
+            "get_llm_synthesis": self.get_llm_synthesis,
+            "get_crypto_gaming_news": gemini_analytics.get_crypto_gaming_news,
+            "ronin_insights": self.ronin_insights,
+            "news_insights": self.news_insights,
+            "llm_cache_stats": self.llm_cache.stats,
+            "news_dedup_stats": self.news_index.stats,
+            "metric_stats": self.ronin.metric_stats.stats,
+            "game_history": self.ronin.game_history.history,
+            "game_rankings": self.ronin.game_history.stats,
+            "refresh_schedule": self.scheduler.stats,
+            "circuit_breakers": self.circuit_breakers,
+            "latest_insights": self.store.latest,
+            "insights_since": self.store.since,
+            "metric_history": self.store.metric_history,
+            "metrics": instrumentation.render_prometheus,
+        }
+
+    def generate_knowledge_base(self) -> List[str]:
+        with self._ronin_lock:
+            return self.ronin.generate_knowledge_base()
+
+    def get_llm_synthesis(self, metrics: Optional[List[str]] = None) -> List[str]:
+        """Synthesize insights from the given metrics, or from a fresh knowledge base."""
+        if metrics is None:
+            with self._ronin_lock:
+                metrics = self.ronin.knowledge_base_metrics()
+        return ronin_analytics.get_llm_synthesis(
+            metrics, cache=self.llm_cache, router=self.ronin.section_router
+        )
+
+    def ronin_insights(
+        self, interval_minutes: int = 30, max_stale_minutes: int = 240
+    ) -> List[str]:
+        """Rate-limited Ronin insights, as printed by ronin_analytics.py."""
+        # Stale insights are served without waiting; refreshes take the lock
+        return ronin_analytics.rate_limited_main(
+            self.dune,
+            self.model,
+            interval_minutes,
+            ronin_analytics=self.ronin,
+            llm_cache=self.llm_cache,
+            max_stale_minutes=max_stale_minutes,
+            ronin_lock=self._ronin_lock,
+            scheduler=self.scheduler,
+            store=self.store,
+        )
+
+    def circuit_breakers(self) -> Dict[str, Dict[str, str]]:
+        """State of every upstream endpoint's circuit breaker."""
+        return {
+            "dune": self.dune.upstream.breaker_states(),
+            "gemini": ronin_analytics.GEMINI_UPSTREAM.breaker_states(),
+            "gemini_news": gemini_analytics.NEWS_UPSTREAM.breaker_states(),
+        }
+
+    def news_insights(self, interval_minutes: int = 30) -> List[str]:
+        """Rate-limited news insights, keeping only news not handed out before."""
+        return gemini_analytics.rate_limited_main(
+            interval_minutes,
+            dedup_index=self.news_index,
+            scheduler=self.scheduler,
+            store=self.store,
+        )
+
+    def handle(self, line: str) -> Dict[str, Any]:
+        """Run a single JSON-lines request and build its response."""
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get("id")
+            method = self.methods.get(request.get("method"))
+            if method is None:
+                return {
+                    "id": request_id,
+                    "error": f"Unknown method: {request.get('method')}",
+                }
+            return {"id": request_id, "result": method(**request.get("params", {}))}
+        except Exception as e:
+            return {"id": request_id, "error": str(e)}
+
+
+def serve_stdio(service: AnalyticsService, max_workers: int = 4) -> None:
+    """Serve requests read from stdin, writing responses to stdout."""
+    out: TextIO = sys.stdout
+    # Keep diagnostic prints from the analytics modules off the protocol stream
+    sys.stdout = sys.stderr
+    write_lock = threading.Lock()
+
+    def respond(line: str) -> None:
+        response = service.handle(line)
+        with write_lock:
+            out.write(json.dumps(response) + "\n")
+            out.flush()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for line in sys.stdin:
+            if line.strip():
+                executor.submit(respond, line)
+
+
+def serve_socket(service: AnalyticsService, socket_path: str) -> None:
+    """Serve requests over a Unix domain socket, one connection per client."""
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for raw in self.rfile:
+                line = raw.decode("utf-8")
+                if line.strip():
+                    response = service.handle(line)
+                    self.wfile.write((json.dumps(response) + "\n").encode("utf-8"))
+                    self.wfile.flush()
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+    sys.stdout = sys.stderr
+    with socketserver.ThreadingUnixStreamServer(socket_path, Handler) as server:
+        server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resident Ronin analytics service")
+    parser.add_argument(
+        "--socket", help="Unix socket path to listen on instead of stdin/stdout"
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        help="serve Prometheus metrics on http://127.0.0.1:PORT/metrics",
+    )
+    args = parser.parse_args()
+
+    instrumentation.configure_from_env()
+    if args.metrics_port:
+        instrumentation.serve_prometheus(args.metrics_port)
+
+    service = AnalyticsService()
+    if args.socket:
+        serve_socket(service, args.socket)
+    else:
+        serve_stdio(service)
@@ -0,0 +1,214 @@
+import os
+import json
+import hashlib
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import instrumentation
+from refresh_lock import atomic_write_json
+
+
+class DuneResultCache:
+    """
+    On-disk cache of Dune query results keyed by query ID.
+
+    Each entry stores the result rows together with the execution ID they came
+    from. Before serving an entry, the cache asks Dune for the latest execution
+    metadata (a single-row request) and only downloads the full result set when
+    the query has been re-executed since the last pull.
+
+    Projected CSV results are cached the same way, one entry per query and
+    column projection; the row filter is kept in the entry, so a changed
+    filter downloads again and replaces it.
+    """
+
+    def __init__(
+        self,
+        dune_client,
+        cache_dir: str,
+        ttl_seconds: float = 24 * 60 * 60,
+        max_bytes: int = 50 * 1024 * 1024,
+    ):
+        """
+        Args:
+            dune_client: DuneClient instance
+            cache_dir: Directory holding one JSON file per query
+            ttl_seconds: Maximum age of an entry before it is downloaded again
+            max_bytes: Total size of the cache directory before eviction
+        """
+        self.dune = dune_client
+        self.cache_dir = Path(cache_dir)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._evict_lock = threading.Lock()
+
+    def _entry_path(self, query_id: int, variant: Optional[str] = None) -> Path:
+        name = str(query_id) if variant is None else f"{query_id}.{variant}"
+        return self.cache_dir / f"{name}.json"
+
+    def _load(self, path: Path) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except (json.JSONDecodeError, FileNotFoundError, ValueError):
+            return None
+
+    def _store(self, path: Path, entry: Dict[str, Any]) -> None:
+        atomic_write_json(str(path), entry)
+
+    def latest_execution(self, query_id: int) -> Dict[str, Any]:
+        """
+        Fetch metadata for the latest execution of a query without its rows.
+
+        Returns:
+            Dict[str, Any]: execution_id and execution_ended_at of the result
+        """
+        response = self.dune._get(
+            route=f"/query/{query_id}/results", params={"limit": 1}
+        )
+        return {
+            "execution_id": response["execution_id"],
+            "execution_ended_at": response.get("execution_ended_at"),
+        }
+
+    def get_rows(self, query_id: int) -> List[Dict[str, Any]]:
+        """
+        Return the latest result rows for a query, downloading only on change.
+
+        If Dune cannot be reached, for instance because the client's circuit
+        breaker is open, any stored entry is served regardless of its age.
+        """
+
+        def download(latest: Optional[Dict[str, Any]]) -> Tuple[str, Any, Any]:
+            response = self.dune.get_latest_result(query_id)
+            ended_at = response.times.execution_ended_at
+            return (
+                response.execution_id,
+                ended_at.isoformat() if ended_at else None,
+                response.result.rows,
+            )
+
+        return self._get(query_id, self._entry_path(query_id), "rows", None, download)
+
+    def get_csv(
+        self, query_id: int, columns: List[str], filters: Optional[str] = None
+    ) -> str:
+        """
+        Return the latest result of a query as CSV text, projected and filtered
+        by Dune, downloading only on change.
+
+        Args:
+            query_id: Dune query ID
+            columns: Columns to download
+            filters: Dune row filter, e.g. "day >= '2024-01-01'"
+        """
+        variant = hashlib.sha1(json.dumps(columns).encode()).hexdigest()[:12]
+
+        def download(latest: Optional[Dict[str, Any]]) -> Tuple[str, Any, Any]:
+            # CSV downloads carry no execution metadata of their own
+            latest = latest or self.latest_execution(query_id)
+            data = self.dune.download_csv(
+                query_id, columns=columns, filters=filters
+            ).data.read()
+            if isinstance(data, bytes):
+                data = data.decode()
+            return latest["execution_id"], latest["execution_ended_at"], data
+
+        return self._get(
+            query_id, self._entry_path(query_id, variant), "csv", filters, download
+        )
+
+    def _get(
+        self,
+        query_id: int,
+        path: Path,
+        field: str,
+        filters: Optional[str],
+        download: Callable[[Optional[Dict[str, Any]]], Tuple[str, Any, Any]],
+    ) -> Any:
+        entry = self._load(path)
+        try:
+            return self._refresh(query_id, path, field, filters, entry, download)
+        except Exception as e:
+            if entry is None:
+                raise
+            print(f"Error refreshing Dune query {query_id}, serving cached rows: {str(e)}")
+            self._count(query_id, "fallback")
+            return entry[field]
+
+    def _refresh(
+        self,
+        query_id: int,
+        path: Path,
+        field: str,
+        filters: Optional[str],
+        entry: Optional[Dict[str, Any]],
+        download: Callable[[Optional[Dict[str, Any]]], Tuple[str, Any, Any]],
+    ) -> Any:
+        latest = None
+        if entry is not None and entry.get("filters") == filters:
+            fetched_at = datetime.fromisoformat(entry["fetched_at"])
+            age = (datetime.now() - fetched_at).total_seconds()
+            if age <= self.ttl_seconds:
+                latest = self.latest_execution(query_id)
+                if latest["execution_id"] == entry["execution_id"]:
+                    # Record the access for LRU eviction
+                    os.utime(path)
+                    self._count(query_id, "hit")
+                    return entry[field]
+                self._count(query_id, "changed")
+            else:
+                self._count(query_id, "expired")
+        elif entry is not None:
+            self._count(query_id, "changed")
+        else:
+            self._count(query_id, "miss")
+
+        execution_id, ended_at, payload = download(latest)
+        entry = {
+            "query_id": query_id,
+            "execution_id": execution_id,
+            "execution_ended_at": ended_at,
+            "fetched_at": datetime.now().isoformat(),
+            field: payload,
+        }
+        if filters is not None:
+            entry["filters"] = filters
+        self._store(path, entry)
+        self.evict()
+
+        return payload
+
+    def _count(self, query_id: int, outcome: str) -> None:
+        instrumentation.inc(
+            "analytics_dune_cache_total", query_id=query_id, outcome=outcome
+        )
+
+    def evict(self) -> None:
+        """Drop expired entries, then least recently used ones until under max_bytes."""
+        with self._evict_lock:
+            entries = []
+            for path in self.cache_dir.glob("*.json"):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+            now = datetime.now().timestamp()
+            total_bytes = 0
+            live = []
+            for mtime, size, path in entries:
+                if now - mtime > self.ttl_seconds:
+                    path.unlink(missing_ok=True)
+                else:
+                    live.append((mtime, size, path))
+                    total_bytes += size
+
+            for mtime, size, path in sorted(live):
+                if total_bytes <= self.max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                total_bytes -= size
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, IO, Iterable, List, Optional
+
+from metric_changes import Series, parse_dates
+
+# Typed columns of a Dune result, keyed by column name
+Columns = Dict[str, np.ndarray]
+
+
+def downcast(values: np.ndarray) -> np.ndarray:
+    """
+    Narrow a numeric column to the smallest dtype that holds it exactly.
+
+    Integers narrow to int32 when they fit; floats narrow to float32 only when
+    every value survives the round trip unchanged.
+    """
+    values = np.asarray(values)
+    if values.dtype.kind in "iu" and len(values):
+        info = np.iinfo(np.int32)
+        if values.min() >= info.min and values.max() <= info.max:
+            return values.astype(np.int32)
+    elif values.dtype.kind == "f":
+        narrow = values.astype(np.float32)
+        if np.array_equal(narrow.astype(values.dtype), values, equal_nan=True):
+            return narrow
+    return values
+
+
+def columns_from_csv(
+    data: IO, date_columns: Iterable[str], value_columns: Iterable[str]
+) -> Columns:
+    """
+    Parse a Dune CSV result into typed columns, reading only the ones named.
+
+    Args:
+        data: CSV payload, e.g. ExecutionResultCSV.data
+        date_columns: Columns parsed into datetime64[ns]
+        value_columns: Columns parsed into downcast numeric arrays
+    """
+    date_columns = list(date_columns)
+    value_columns = list(value_columns)
+    frame = pd.read_csv(data, usecols=date_columns + value_columns)
+
+    columns: Columns = {}
+    for column in date_columns:
+        columns[column] = parse_dates(frame[column])
+    for column in value_columns:
+        columns[column] = downcast(pd.to_numeric(frame[column]).to_numpy())
+    return columns
+
+
+def columns_from_rows(
+    rows: List[Dict[str, Any]],
+    date_columns: Iterable[str],
+    value_columns: Iterable[str],
+) -> Columns:
+    """
+    Extract typed columns from result rows without building a DataFrame.
+
+    Missing or null values become NaN.
+    """
+    columns: Columns = {}
+    for column in date_columns:
+        columns[column] = parse_dates(pd.Series([row[column] for row in rows]))
+    for column in value_columns:
+        values = np.fromiter(
+            (_number(row.get(column)) for row in rows),
+            dtype=np.float64,
+            count=len(rows),
+        )
+        columns[column] = downcast(values)
+    return columns
+
+
+def _number(value: Optional[Any]) -> float:
+    return np.nan if value is None else float(value)
+
+
+def series_from_columns(
+    columns: Columns, value_column: str, date_column: str
+) -> Series:
+    """
+    Build a metric series from typed columns, sorted once by date.
+
+    Returns:
+        Series: Ascending datetime64 dates and float64 values
+    """
+    dates = columns[date_column]
+    order = np.argsort(dates, kind="stable")
+    return dates[order], columns[value_column][order].astype(np.float64)
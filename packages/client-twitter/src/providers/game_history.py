@@ -0,0 +1,252 @@
+import heapq
+import json
+import threading
+from dataclasses import dataclass, replace
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+from refresh_lock import atomic_write_json
+
+# Criteria top_games selects by, in the order their picks are listed
+CRITERIA = ("size", "growth", "acceleration")
+
+
+@dataclass(frozen=True, slots=True)
+class GameTrend:
+    """
+    Standing of one game among all games the activity query lists.
+
+    Attributes:
+        rank: Position by DAU, 1 for the largest game
+        previous_rank: Position by DAU on the latest earlier day ranked, None
+            if unknown
+        new: Whether the game was missing from that earlier ranking
+        acceleration: 7d growth minus the 7d growth recorded a week or more
+            earlier, in percentage points; None without such a snapshot
+        criteria: Criteria the game was selected for the prompt by
+    """
+
+    rank: int
+    previous_rank: Optional[int] = None
+    new: bool = False
+    acceleration: Optional[float] = None
+    criteria: Tuple[str, ...] = ()
+
+    @property
+    def movement(self) -> Optional[int]:
+        """Places climbed since the earlier ranking, negative after a fall."""
+        if self.previous_rank is None:
+            return None
+        return self.previous_rank - self.rank
+
+
+def describe_trend(trend: GameTrend) -> str:
+    """Rank movement and growth acceleration of a game for its metric line."""
+    rank = f"DAU rank #{trend.rank}"
+    movement = trend.movement
+    if trend.new:
+        rank += " (new)"
+    elif movement:
+        rank += f" ({'up' if movement > 0 else 'down'} {abs(movement)})"
+    parts = [rank]
+    if trend.acceleration is not None:
+        parts.append(f"7d growth {trend.acceleration:+.1f} pts vs a week earlier")
+    if trend.criteria:
+        parts.append("top by " + ", ".join(trend.criteria))
+    return " | ".join(parts)
+
+
+def _number(value: Any) -> Optional[float]:
+    return None if value is None else float(value)
+
+
+def rank_games(games: List[Dict[str, Any]]) -> Dict[str, GameTrend]:
+    """Rank every game by DAU, ties broken by name."""
+    ordered = sorted(
+        games, key=lambda g: (-(_number(g["num_of_accounts_1d"]) or 0), g["project"])
+    )
+    return {g["project"]: GameTrend(rank) for rank, g in enumerate(ordered, 1)}
+
+
+def top_games(
+    games: List[Dict[str, Any]], trends: Dict[str, GameTrend], k: int
+) -> Dict[str, Tuple[str, ...]]:
+    """
+    Select the k largest games by each criterion.
+
+    Each criterion is one heap selection over the games, so picking stays
+    linear in the number of games listed:
+
+    - size: DAU
+    - growth: 7d change of WAU
+    - acceleration: GameTrend.acceleration
+
+    Games without a value for a criterion are not considered for it.
+
+    Args:
+        games: Rows of the game activity query
+        trends: Trend per project, e.g. from GameHistory.record
+        k: Games selected per criterion
+
+    Returns:
+        Dict[str, Tuple[str, ...]]: Criteria keyed by selected project, in
+        the order of CRITERIA and of rank within each criterion
+    """
+    keys = {
+        "size": lambda g: _number(g["num_of_accounts_1d"]),
+        "growth": lambda g: _number(g.get("diff_7d")),
+        "acceleration": lambda g: trends[g["project"]].acceleration,
+    }
+    picks: Dict[str, List[str]] = {}
+    for criterion in CRITERIA:
+        key = keys[criterion]
+        candidates = [g for g in games if key(g) is not None]
+        for game in heapq.nlargest(k, candidates, key=key):
+            picks.setdefault(game["project"], []).append(criterion)
+    return {project: tuple(criteria) for project, criteria in picks.items()}
+
+
+class GameHistory:
+    """
+    Local history of per-game activity and of the DAU ranking.
+
+    Each game keeps at most one snapshot per day, a compact
+    [day ordinal, DAU, WAU, MAU, 7d growth] list, for max_days days; games
+    that stop being listed age out with their snapshots. The DAU ranking of
+    every game is kept per day, for today and the latest earlier day, so a
+    game entering the top of any criterion still gets its rank movement, and
+    repeated runs on one day all compare against the same earlier ranking
+    instead of against each other. State is persisted to a JSON file so
+    one-shot runs share it.
+    """
+
+    def __init__(self, history_path: Optional[str] = None, max_days: int = 60):
+        """
+        Args:
+            history_path: JSON file to persist the history to, or None for
+                memory only
+            max_days: Days of snapshots kept per game
+        """
+        self.history_path = history_path
+        self.max_days = max_days
+        self._games: Dict[str, List[List[float]]] = {}
+        # Ranks keyed by project, keyed by day ordinal as a string
+        self._rankings: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        if not self.history_path:
+            return
+        try:
+            with open(self.history_path, "r") as f:
+                data = json.load(f)
+            self._games = data.get("games", {})
+            self._rankings = data.get("rankings", {})
+        except (json.JSONDecodeError, FileNotFoundError, ValueError):
+            return
+
+    def _save(self) -> None:
+        if self.history_path:
+            atomic_write_json(
+                self.history_path, {"games": self._games, "rankings": self._rankings}
+            )
+
+    def record(
+        self, games: List[Dict[str, Any]], today: Optional[date] = None
+    ) -> Dict[str, GameTrend]:
+        """
+        Rank the games, compare them with the history, then add a snapshot.
+
+        A second run on the same day replaces that day's snapshot and
+        ranking; rank movements are relative to the latest earlier day, so
+        they hold across runs whether or not the rows changed in between.
+
+        Args:
+            games: Rows of the game activity query
+            today: Day the snapshot is filed under, today by default
+
+        Returns:
+            Dict[str, GameTrend]: Trend keyed by project, without criteria
+        """
+        day = (today or date.today()).toordinal()
+        with self._lock:
+            self._load()
+            trends = rank_games(games)
+            earlier_days = [d for d in self._rankings if int(d) < day]
+            previous = (
+                self._rankings[max(earlier_days, key=int)] if earlier_days else None
+            )
+
+            for game in games:
+                project = game["project"]
+                growth = _number(game.get("diff_7d"))
+                snapshots = self._games.setdefault(project, [])
+
+                acceleration = None
+                # Latest snapshot at least a week old
+                earlier = [s for s in snapshots if s[0] <= day - 7]
+                if growth is not None and earlier and earlier[-1][4] is not None:
+                    acceleration = (growth - earlier[-1][4]) * 100
+
+                previous_rank = previous.get(project) if previous else None
+                trends[project] = replace(
+                    trends[project],
+                    previous_rank=previous_rank,
+                    new=previous is not None and previous_rank is None,
+                    acceleration=acceleration,
+                )
+
+                if snapshots and snapshots[-1][0] == day:
+                    snapshots.pop()
+                snapshots.append(
+                    [
+                        day,
+                        _number(game["num_of_accounts_1d"]),
+                        _number(game.get("num_of_accounts_7d")),
+                        _number(game.get("num_of_accounts_30d")),
+                        growth,
+                    ]
+                )
+
+            cutoff = day - self.max_days
+            for project in list(self._games):
+                kept = [s for s in self._games[project] if s[0] > cutoff]
+                if kept:
+                    self._games[project] = kept
+                else:
+                    del self._games[project]
+
+            ranks = {project: trend.rank for project, trend in trends.items()}
+            self._rankings = {str(day): ranks}
+            if earlier_days:
+                self._rankings[max(earlier_days, key=int)] = previous
+            self._save()
+            return trends
+
+    def history(self, project: str) -> List[Dict[str, Any]]:
+        """Snapshots of one game, oldest first."""
+        with self._lock:
+            return [
+                {
+                    "date": date.fromordinal(int(day)).isoformat(),
+                    "dau": dau,
+                    "wau": wau,
+                    "mau": mau,
+                    "growth_7d": growth,
+                }
+                for day, dau, wau, mau, growth in self._games.get(project, [])
+            ]
+
+    def stats(self) -> Dict[str, Any]:
+        """Number of games and snapshots held, and the latest ranking."""
+        with self._lock:
+            latest = max(self._rankings, key=int) if self._rankings else None
+            return {
+                "games": len(self._games),
+                "snapshots": sum(len(s) for s in self._games.values()),
+                "ranked_on": (
+                    date.fromordinal(int(latest)).isoformat() if latest else None
+                ),
+                "ranks": dict(self._rankings[latest]) if latest else {},
+            }
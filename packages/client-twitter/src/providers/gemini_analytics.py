@@ -1,16 +1,64 @@
+from __future__ import annotations
+
 import os
+import sys
 import json
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import List
-from google import genai
-from google.generativeai.types import content_types
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 from dotenv import load_dotenv
 
+import instrumentation
+from lazy_imports import LazyModule, LazyObject
+from news_dedup import NewsDedupIndex, normalize
+from insight_store import InsightStore
+from ndjson_records import make_record, write_records
+from refresh_lock import atomic_write_json, run_single_flight
+from refresh_scheduler import RefreshScheduler
+from resilient_client import Upstream
+
 load_dotenv()
 
 GOOGLE_API_KEY = os.environ.get("GOOGLE_GENERATIVE_AI_API_KEY")
 
+# The Gemini SDK is only imported once a refresh needs it, so serving cached
+# insights stays fast
+genai = LazyModule("google.genai")
+
+NEWS_MODEL = "gemini-2.0-flash-exp"
+
+# News categories in output order
+NEWS_CATEGORIES = ["Crypto Gaming", "Web3 Gaming", "General Crypto Market Updates"]
+
+# Retries and circuit breaker shared by every news search
+NEWS_UPSTREAM = Upstream("gemini_news", retries=1, backoff_base=2.0)
+
+# Refresh scheduler source name of the news feed
+NEWS_SOURCE = "news"
+
+# Directory holding the news lockfile
+STATE_DIR = Path(os.environ.get("ANALYTICS_STATE_DIR") or Path(__file__).parent)
+
+# Shared Gemini client, created on first use
+_client: Optional[genai.Client] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> genai.Client:
+    """Return the shared Gemini client, creating it on first use."""
+    global _client
+
+    with _client_lock:
+        if _client is None:
+            _client = genai.Client(
+                http_options={"api_version": "v1alpha"}, api_key=GOOGLE_API_KEY
+            )
+        return _client
+
 
 def should_run(lockfile_path: str, interval_minutes: int = 30) -> bool:
     """
@@ -45,11 +93,7 @@ def update_lockfile(lockfile_path: str, news_data: List[str]) -> None:
     """Update the lockfile with current timestamp and data."""
     data = {"last_run": datetime.now().isoformat(), "last_data": news_data}
 
-    # Ensure directory exists
-    os.makedirs(os.path.dirname(lockfile_path), exist_ok=True)
-
-    with open(lockfile_path, "w") as f:
-        json.dump(data, f)
+    atomic_write_json(lockfile_path, data)
 
 
 def get_cached_data(lockfile_path: str) -> List[str]:
@@ -62,104 +106,314 @@ def get_cached_data(lockfile_path: str) -> List[str]:
         return []
 
 
-def get_crypto_gaming_news() -> List[str]:
-    """Fetch and process latest crypto gaming news using Gemini."""
-    _client = genai.Client(
-        http_options={"api_version": "v1alpha"}, api_key=GOOGLE_API_KEY
+def get_crypto_gaming_news(
+    categories: Optional[List[str]] = None,
+    fan_out: bool = True,
+    max_concurrency: int = 4,
+) -> List[str]:
+    """
+    Fetch and process latest crypto gaming news using Gemini.
+
+    News is reassembled in category order. See iter_crypto_gaming_news for
+    the arguments.
+    """
+    records = crypto_gaming_news_records(categories, fan_out, max_concurrency)
+    return [record["text"] for record in records]
+
+
+def crypto_gaming_news_records(
+    categories: Optional[List[str]] = None,
+    fan_out: bool = True,
+    max_concurrency: int = 4,
+) -> List[Dict[str, Any]]:
+    """News records from get_crypto_gaming_news, in category order."""
+    categories = categories or NEWS_CATEGORIES
+    return sorted(
+        iter_crypto_gaming_news(
+            categories, fan_out=fan_out, max_concurrency=max_concurrency
+        ),
+        key=lambda r: category_position(categories, r["section"]),
     )
-    _model = "gemini-2.0-flash-exp"
 
-    yesterday = (datetime.now() - timedelta(days=1)).strftime("%B %d %Y")
 
-    search_tool = {"google_search": {}}
-    games_chat = _client.chats.create(model=_model, config={"tools": [search_tool]})
+def category_position(categories: List[str], category: str) -> int:
+    """Position of category in categories, with unknown categories last."""
+    try:
+        return categories.index(category)
+    except ValueError:
+        return len(categories)
+
+
+def news_prompt(categories: List[str]) -> str:
+    """Prompt asking for the latest headlines in each category."""
+    yesterday = (datetime.now() - timedelta(days=1)).strftime("%B %d %Y")
+    numbered = "\n".join(
+        f"    {i + 1}. {category}" for i, category in enumerate(categories)
+    )
 
-    prompt = f"""Give me the latest developments and headlines for the following categories since {yesterday}:
-    1. Crypto Gaming
-    2. Web3 Gaming
-    3. General Crypto Market Updates
+    return f"""Give me the latest developments and headlines for the following categories since {yesterday}:
+{numbered}
 
     Format as bullet points with the category prefix [Category]. Include specific details like numbers, percentages, and project names when available.
     Be concise and focus on significant developments only."""
 
-    try:
-        response = games_chat.send_message(prompt)
-        news_insights = []
-        current_time = datetime.now().strftime("%Y-%m-%d %H:%M")
 
-        # Get the raw text content from the response
-        raw_text = response.candidates[0].content.parts[0].text
+def parse_news(
+    raw_text: str, default_category: Optional[str] = None
+) -> Iterator[Tuple[str, str]]:
+    """
+    Yield (category, headline) pairs from a markdown news reply.
 
-        # Split the text into sections based on category headers
-        sections = raw_text.split("\n\n")
+    Args:
+        raw_text: Reply with **[Category]** headers followed by bullet points
+        default_category: Category of bullets that come before any header
+    """
+    # Split the text into sections based on category headers
+    for section in raw_text.split("\n\n"):
+        current_category = default_category
 
-        for section in sections:
-            lines = section.split("\n")
-            current_category = None
+        for line in section.split("\n"):
+            line = line.strip()
+            if not line:
+                continue
 
-            for line in lines:
-                line = line.strip()
-                if not line:
-                    continue
+            # Check if this is a category header
+            if line.startswith("**[") and line.endswith("]**"):
+                current_category = line.replace("**[", "").replace("]**", "")
+                continue
 
-                # Check if this is a category header
-                if line.startswith("**[") and line.endswith("]**"):
-                    current_category = line.replace("**[", "").replace("]**", "")
-                    continue
+            # Process bullet points
+            if line.startswith("*"):
+                # Remove bullet point and any markdown formatting
+                content = line.replace("*", "").strip()
+                # Remove any remaining markdown formatting for bold text
+                content = content.replace("**", "")
 
-                # Process bullet points
-                if line.startswith("*"):
-                    # Remove bullet point and any markdown formatting
-                    content = line.replace("*", "").strip()
-                    # Remove any remaining markdown formatting for bold text
-                    content = content.replace("**", "")
+                if current_category:
+                    yield current_category, content
 
-                    if current_category:
-                        insight = f"[{current_time}] [{current_category}] {content}"
-                        news_insights.append(insight)
 
-        return news_insights
-    except Exception as e:
-        print(f"Error fetching crypto gaming news: {str(e)}")
-        return []
+def fetch_news(categories: List[str], label: str) -> str:
+    """
+    Ask a Google-Search-grounded chat for the headlines of categories.
+
+    Args:
+        categories: Categories to cover in one reply
+        label: Section label for the span and token counts
+
+    Returns:
+        str: Raw markdown reply
+    """
+    search_tool = {"google_search": {}}
+    games_chat = get_client().chats.create(
+        model=NEWS_MODEL, config={"tools": [search_tool]}
+    )
+
+    with instrumentation.span("news_fetch", section=label) as fields:
+        response = NEWS_UPSTREAM.call(
+            f"send_message:{NEWS_MODEL}", games_chat.send_message, news_prompt(categories)
+        )
+        instrumentation.record_token_usage(response, label, fields)
 
+    # Get the raw text content from the response
+    return response.candidates[0].content.parts[0].text
 
-def rate_limited_main(interval_minutes: int = 30) -> List[str]:
+
+def iter_crypto_gaming_news(
+    categories: Optional[List[str]] = None,
+    fan_out: bool = True,
+    max_concurrency: int = 4,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield a news record for each bullet as it is parsed from Gemini's reply.
+
+    With fan_out, each category is its own grounded query, run concurrently;
+    a failed category is reported and skipped while the others are still
+    yielded. Otherwise one query covers every category.
+
+    Args:
+        categories: News categories to fetch, NEWS_CATEGORIES by default
+        fan_out: Send one query per category instead of one for all
+        max_concurrency: Maximum number of category queries in flight at once
+    """
+    categories = categories or NEWS_CATEGORIES
+
+    def records(raw_text: str, only_category: Optional[str] = None):
+        # A single-category reply is attributed to the category asked for
+        current_time = datetime.now().strftime("%Y-%m-%d %H:%M")
+        for category, content in parse_news(raw_text, only_category):
+            category = only_category or category
+            insight = f"[{current_time}] [{category}] {content}"
+            yield make_record("gemini_news", "insight", category, insight)
+
+    if not fan_out:
+        try:
+            yield from records(fetch_news(categories, "news"))
+        except Exception as e:
+            print(f"Error fetching crypto gaming news: {str(e)}")
+        return
+
+    def fetch_category(category: str) -> List[Dict[str, Any]]:
+        return list(records(fetch_news([category], category), category))
+
+    with ThreadPoolExecutor(
+        max_workers=max(1, min(max_concurrency, len(categories)))
+    ) as executor:
+        futures = {
+            executor.submit(fetch_category, category): category
+            for category in categories
+        }
+
+        for future in as_completed(futures):
+            category = futures[future]
+            try:
+                yield from future.result()
+            except Exception as e:
+                print(f"Error fetching {category} news: {str(e)}")
+
+
+def rate_limited_main(
+    interval_minutes: int = 30,
+    dedup_index: Optional[NewsDedupIndex] = None,
+    scheduler: Optional[RefreshScheduler] = None,
+    store: Optional[InsightStore] = None,
+) -> List[str]:
     """
     Rate-limited version of main function that only runs if enough time has passed.
 
     Args:
         interval_minutes: Minimum minutes between runs
+        dedup_index: Optional index of news already handed out; when given, a
+            refresh keeps only the insights that are new or materially
+            changed, and one with nothing new keeps serving the previous news
+        scheduler: Optional adaptive schedule replacing interval_minutes; the
+            feed is polled more often while it keeps yielding different news
+        store: Optional shared store each refresh's insights are written to
 
     Returns:
         List[str]: News insights or cached data if skipped
     """
-    # Use a lockfile in the same directory as the script
-    script_dir = Path(__file__).parent
-    lockfile_path = script_dir / ".news_lockfile.json"
-
-    if not should_run(str(lockfile_path), interval_minutes):
-        print(
-            f"Skipping run - less than {interval_minutes} minutes since last execution"
-        )
+    # Use a lockfile in the state directory
+    lockfile_path = STATE_DIR / ".news_lockfile.json"
+
+    def count(outcome: str) -> None:
+        instrumentation.inc("analytics_refresh_total", pipeline="news", outcome=outcome)
+
+    def skip() -> List[str]:
+        if scheduler is None:
+            print(
+                f"Skipping run - less than {interval_minutes} minutes since last execution"
+            )
+        else:
+            print("Skipping run - news feed is not due for a refresh")
+        count("skipped")
         return get_cached_data(str(lockfile_path))
 
-    try:
-        # Get news insights
-        insights = get_crypto_gaming_news()
+    def due() -> bool:
+        if scheduler is None:
+            return should_run(str(lockfile_path), interval_minutes)
+        return scheduler.due(NEWS_SOURCE)
+
+    def refresh() -> List[str]:
+        try:
+            # Get news insights
+            records = crypto_gaming_news_records()
+            insights = [record["text"] for record in records]
+            fetched = len(insights)
+            if dedup_index is not None:
+                insights = dedup_index.filter_new(insights)
+                kept = set(insights)
+                records = [record for record in records if record["text"] in kept]
+                instrumentation.inc(
+                    "analytics_news_dedup_total", fetched - len(insights), outcome="dropped"
+                )
+                instrumentation.inc(
+                    "analytics_news_dedup_total", len(insights), outcome="new"
+                )
+
+            if scheduler is not None:
+                # Every category failing leaves nothing fetched
+                if not fetched:
+                    scheduler.record_failure(NEWS_SOURCE)
+                else:
+                    digest = hashlib.sha256(
+                        json.dumps(sorted(normalize(i) for i in insights)).encode()
+                    )
+                    scheduler.record_success(NEWS_SOURCE, digest.hexdigest())
+
+            if store is not None and records:
+                store.write_run("news", records)
+
+            # Keep serving the last non-empty news when nothing new came in,
+            # while still recording the run
+            if not insights:
+                print("News refresh found nothing new - keeping previous")
+                insights = get_cached_data(str(lockfile_path))
+            update_lockfile(str(lockfile_path), insights)
+            count("refreshed")
+
+            return insights
+
+        except Exception as e:
+            print(f"Error running news fetcher: {str(e)}")
+            count("error")
+            if scheduler is not None:
+                scheduler.record_failure(NEWS_SOURCE)
+            cached_data = get_cached_data(str(lockfile_path))
+            return cached_data
+
+        finally:
+            instrumentation.export()
+
+    # Only one process refreshes; concurrent callers wait and then skip
+    return run_single_flight(
+        str(STATE_DIR / ".news_lockfile.lock"),
+        due,
+        refresh,
+        skip,
+    )
 
-        # Update the lockfile after successful run
-        update_lockfile(str(lockfile_path), insights)
 
-        return insights
+def iter_main(store: Optional[InsightStore] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Streaming version of a news refresh.
 
-    except Exception as e:
-        print(f"Error running news fetcher: {str(e)}")
-        cached_data = get_cached_data(str(lockfile_path))
-        return cached_data
+    News records are yielded as they are parsed, and the collected insights are
+    stored in the lockfile so rate_limited_main can serve them afterwards, and
+    in store if one is given.
+    """
+    records = []
+    for record in iter_crypto_gaming_news():
+        records.append(record)
+        yield record
+
+    if records:
+        update_lockfile(
+            str(STATE_DIR / ".news_lockfile.json"), [r["text"] for r in records]
+        )
+        if store is not None:
+            store.write_run("news", records)
 
 
 if __name__ == "__main__":
-    insights = rate_limited_main()
-    for insight in insights:
-        print(insight)
+    parser = argparse.ArgumentParser(description="Crypto gaming news insights")
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="run a fresh refresh, emitting each insight as NDJSON",
+    )
+    args = parser.parse_args()
+
+    instrumentation.configure_from_env()
+    store = LazyObject(lambda: InsightStore(str(STATE_DIR / ".insights.db")))
+
+    if args.stream:
+        # Keep diagnostic prints off the record stream
+        out = sys.stdout
+        sys.stdout = sys.stderr
+        write_records(iter_main(store), out)
+        instrumentation.export()
+    else:
+        insights = rate_limited_main(store=store)
+        for insight in insights:
+            print(insight)
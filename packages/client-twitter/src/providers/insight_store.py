@@ -0,0 +1,249 @@
+import os
+import time
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    pipeline TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_pipeline_time ON runs (pipeline, created_at);
+
+CREATE TABLE IF NOT EXISTS insights (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    pipeline TEXT NOT NULL,
+    source TEXT NOT NULL,
+    section TEXT,
+    created_at REAL NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS insights_run ON insights (run_id);
+CREATE INDEX IF NOT EXISTS insights_pipeline_time ON insights (pipeline, created_at);
+CREATE INDEX IF NOT EXISTS insights_pipeline_run ON insights (pipeline, run_id);
+CREATE INDEX IF NOT EXISTS insights_source_time
+    ON insights (source, section, created_at);
+
+CREATE TABLE IF NOT EXISTS metric_snapshots (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    metric TEXT NOT NULL,
+    section TEXT,
+    query_id INTEGER,
+    observed_at REAL NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS metric_snapshots_metric_time
+    ON metric_snapshots (metric, observed_at);
+CREATE INDEX IF NOT EXISTS metric_snapshots_run ON metric_snapshots (run_id);
+CREATE INDEX IF NOT EXISTS runs_time ON runs (created_at);
+"""
+
+
+def _epoch(value: Any) -> float:
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, str):
+        return datetime.fromisoformat(value).timestamp()
+    return float(value)
+
+
+def metric_name(line: str) -> str:
+    """Name a metric line is filed under: the label before its first colon."""
+    return line.split(":", 1)[0].strip()
+
+
+class InsightStore:
+    """
+    SQLite store of refresh runs, their insights and metric snapshots.
+
+    The database runs in WAL mode, so any number of processes can read the
+    latest insights or their history while one refresh writes a new run.
+    Each run is written in a single transaction, so readers never see half
+    of one. Every thread gets its own connection. Runs older than the
+    retention window are pruned after each write, so the database stays
+    bounded.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        busy_timeout: float = 5.0,
+        retention_days: Optional[float] = 90,
+    ):
+        """
+        Args:
+            db_path: SQLite database file, created if missing
+            busy_timeout: Seconds a write waits for another writer's lock
+            retention_days: Days runs are kept for, or None to keep them all
+        """
+        self.db_path = db_path
+        self.busy_timeout = busy_timeout
+        self.retention_days = retention_days
+        self._local = threading.local()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def write_run(self, pipeline: str, records: Iterable[Dict[str, Any]]) -> int:
+        """
+        Store one refresh: its insight records and metric records.
+
+        Runs past the retention window are pruned afterwards.
+
+        Args:
+            pipeline: Pipeline the run belongs to, e.g. "ronin" or "news"
+            records: Records from ndjson_records.make_record; "metric" records
+                become snapshots, everything else insights
+
+        Returns:
+            int: ID of the new run
+        """
+        now = time.time()
+        with self._connection() as conn:
+            run_id = conn.execute(
+                "INSERT INTO runs (pipeline, created_at) VALUES (?, ?)",
+                (pipeline, now),
+            ).lastrowid
+
+            insights, metrics = [], []
+            for record in records:
+                created_at = _epoch(record.get("timestamp") or now)
+                if record["kind"] == "metric":
+                    metrics.append(
+                        (
+                            run_id,
+                            metric_name(record["text"]),
+                            record.get("section"),
+                            record.get("query_id"),
+                            created_at,
+                            record["text"],
+                        )
+                    )
+                else:
+                    insights.append(
+                        (
+                            run_id,
+                            pipeline,
+                            record["source"],
+                            record.get("section"),
+                            created_at,
+                            record["text"],
+                        )
+                    )
+
+            conn.executemany(
+                "INSERT INTO insights "
+                "(run_id, pipeline, source, section, created_at, text) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                insights,
+            )
+            conn.executemany(
+                "INSERT INTO metric_snapshots "
+                "(run_id, metric, section, query_id, observed_at, text) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                metrics,
+            )
+
+        if self.retention_days is not None:
+            self.prune(now - self.retention_days * 24 * 60 * 60)
+        return run_id
+
+    def latest(self, pipeline: str) -> List[str]:
+        """Insights of the pipeline's latest run that produced any, in order."""
+        rows = (
+            self._connection()
+            .execute(
+                "SELECT text FROM insights WHERE run_id = "
+                "(SELECT MAX(run_id) FROM insights WHERE pipeline = ?) "
+                "ORDER BY id",
+                (pipeline,),
+            )
+            .fetchall()
+        )
+        return [row["text"] for row in rows]
+
+    def since(
+        self,
+        since: Any,
+        pipeline: Optional[str] = None,
+        section: Optional[str] = None,
+        limit: int = 500,
+    ) -> List[Dict[str, Any]]:
+        """
+        Insights created after a point in time, oldest first.
+
+        Args:
+            since: datetime, ISO 8601 string or Unix timestamp
+            pipeline: Only insights of this pipeline
+            section: Only insights of this section or category
+            limit: Maximum number of insights returned
+        """
+        query = "SELECT * FROM insights WHERE created_at > ?"
+        params: List[Any] = [_epoch(since)]
+        if pipeline is not None:
+            query += " AND pipeline = ?"
+            params.append(pipeline)
+        if section is not None:
+            query += " AND section = ?"
+            params.append(section)
+        query += " ORDER BY created_at, id LIMIT ?"
+        params.append(limit)
+
+        return [
+            {
+                "pipeline": row["pipeline"],
+                "source": row["source"],
+                "section": row["section"],
+                "timestamp": datetime.fromtimestamp(row["created_at"]).isoformat(),
+                "text": row["text"],
+            }
+            for row in self._connection().execute(query, params)
+        ]
+
+    def metric_history(
+        self, metric: str, since: Any = 0, limit: int = 500
+    ) -> List[Dict[str, Any]]:
+        """Snapshots of one metric line, e.g. "Current RON Price", oldest first."""
+        rows = self._connection().execute(
+            "SELECT * FROM metric_snapshots WHERE metric = ? AND observed_at > ? "
+            "ORDER BY observed_at, id LIMIT ?",
+            (metric, _epoch(since), limit),
+        )
+        return [
+            {
+                "metric": row["metric"],
+                "section": row["section"],
+                "query_id": row["query_id"],
+                "timestamp": datetime.fromtimestamp(row["observed_at"]).isoformat(),
+                "text": row["text"],
+            }
+            for row in rows
+        ]
+
+    def prune(self, older_than: Any) -> int:
+        """Delete runs written before older_than; returns how many."""
+        cutoff = _epoch(older_than)
+        with self._connection() as conn:
+            stale = "SELECT id FROM runs WHERE created_at < ?"
+            conn.execute(f"DELETE FROM insights WHERE run_id IN ({stale})", (cutoff,))
+            conn.execute(
+                f"DELETE FROM metric_snapshots WHERE run_id IN ({stale})", (cutoff,)
+            )
+            return conn.execute("DELETE FROM runs WHERE created_at < ?", (cutoff,)).rowcount
@@ -0,0 +1,257 @@
+from __future__ import annotations
+
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple
+
+from refresh_lock import atomic_write_text
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+# Upper bounds, in seconds, of the latency histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+METRIC_HELP = {
+    "analytics_span_seconds": "Duration of instrumented pipeline steps",
+    "analytics_span_errors_total": "Instrumented pipeline steps that raised",
+    "analytics_dune_rows_total": "Result rows returned by Dune, per query",
+    "analytics_dune_cache_total": "Dune result cache lookups by outcome",
+    "analytics_llm_cache_total": "LLM response cache lookups by outcome",
+    "analytics_gemini_tokens_total": "Gemini tokens used, per section and kind",
+    "analytics_refresh_total": "rate_limited_main calls by pipeline and outcome",
+    "analytics_news_dedup_total": "News insights kept or dropped by the dedup index",
+    "analytics_upstream_calls_total": "Upstream client calls by endpoint and outcome",
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+events_logger = logging.getLogger("analytics.events")
+events_logger.propagate = False
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (
+        (k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in pairs
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+class MetricsRegistry:
+    """
+    Thread-safe counters and histograms, rendered in Prometheus text format.
+
+    Metrics are created on first use; each distinct label set is its own
+    series.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, amount: float = 1, **labels) -> None:
+        """Add amount to a counter series."""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        """Record one observation in a histogram series."""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            # Per-bucket counts, then sum and count
+            state = series.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def render(self) -> str:
+        """Render every metric in Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{_format_labels(key)} {value:g}")
+
+            for name, series in sorted(self._histograms.items()):
+                lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, state in sorted(series.items()):
+                    for bound, count in zip(self.buckets, state):
+                        le = _format_labels(key, ("le", f"{bound:g}"))
+                        lines.append(f"{name}_bucket{le} {count}")
+                    inf = _format_labels(key, ("le", "+Inf"))
+                    lines.append(f"{name}_bucket{inf} {state[-1]}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {state[-2]:g}")
+                    lines.append(f"{name}_count{_format_labels(key)} {state[-1]}")
+
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# File the metrics are exported to by export(), if configured
+_metrics_path: Optional[str] = None
+
+
+def event(name: str, **fields) -> None:
+    """Write a structured JSON event to the analytics.events logger."""
+    if not events_logger.handlers:
+        return
+    record = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "event": name,
+        **fields,
+    }
+    events_logger.info(json.dumps(record, default=str))
+
+
+@contextmanager
+def span(name: str, **labels) -> Iterator[Dict[str, Any]]:
+    """
+    Time a pipeline step, recording its duration, errors and a JSON event.
+
+    The yielded dict can be filled with extra fields (row counts, token
+    counts) that are added to the event.
+
+    Args:
+        name: Step name, exported as the span label
+        **labels: Low-cardinality labels such as query_id or section
+    """
+    fields: Dict[str, Any] = {}
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield fields
+    except BaseException as e:
+        status = "error"
+        fields["error"] = str(e)
+        REGISTRY.inc("analytics_span_errors_total", span=name, **labels)
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        REGISTRY.observe("analytics_span_seconds", duration, span=name, **labels)
+        event(
+            name,
+            status=status,
+            duration_ms=round(duration * 1000, 3),
+            **labels,
+            **fields,
+        )
+
+
+def inc(name: str, amount: float = 1, **labels) -> None:
+    """Add amount to a counter in the default registry."""
+    REGISTRY.inc(name, amount, **labels)
+
+
+def record_token_usage(response: Any, section: str, fields: Dict[str, Any]) -> None:
+    """Count the prompt and output tokens a Gemini response reports, if any."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    for kind, attribute in (
+        ("prompt", "prompt_token_count"),
+        ("output", "candidates_token_count"),
+    ):
+        count = getattr(usage, attribute, None) or 0
+        fields[f"{kind}_tokens"] = count
+        REGISTRY.inc("analytics_gemini_tokens_total", count, section=section, kind=kind)
+
+
+def render_prometheus() -> str:
+    """Metrics of the default registry in Prometheus text format."""
+    return REGISTRY.render()
+
+
+def write_prometheus(path: str) -> None:
+    """Write the metrics to path through a temp file and rename."""
+    atomic_write_text(path, render_prometheus())
+
+
+def export() -> None:
+    """Write the metrics file, if one was configured."""
+    if _metrics_path is not None:
+        write_prometheus(_metrics_path)
+
+
+def serve_prometheus(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve the metrics at http://host:port/metrics from a daemon thread."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(
+        target=server.serve_forever, name="metrics-http", daemon=True
+    ).start()
+    return server
+
+
+def configure(
+    events_path: Optional[str] = None, metrics_path: Optional[str] = None
+) -> None:
+    """
+    Set where JSON events and exported metrics are written.
+
+    Args:
+        events_path: File to append JSON events to, or "-" for stderr
+        metrics_path: File that export() writes Prometheus metrics to
+    """
+    global _metrics_path
+
+    for handler in list(events_logger.handlers):
+        events_logger.removeHandler(handler)
+        handler.close()
+    if events_path:
+        if events_path == "-":
+            handler = logging.StreamHandler()
+        else:
+            handler = logging.FileHandler(events_path)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        events_logger.addHandler(handler)
+        events_logger.setLevel(logging.INFO)
+
+    _metrics_path = metrics_path
+
+
+def configure_from_env() -> None:
+    """Configure from ANALYTICS_EVENTS_LOG and ANALYTICS_METRICS_FILE."""
+    configure(
+        events_path=os.environ.get("ANALYTICS_EVENTS_LOG"),
+        metrics_path=os.environ.get("ANALYTICS_METRICS_FILE"),
+    )
@@ -0,0 +1,66 @@
+import importlib
+import threading
+from typing import Any, Callable, Optional
+
+
+class LazyModule:
+    """
+    Stand-in for a module that is imported on first attribute access.
+
+    Lets entry points bind heavy dependencies (numpy, pandas, the Gemini
+    SDKs) at module level while paths that never touch them, such as serving
+    cached insights, skip their import cost.
+    """
+
+    def __init__(self, name: str, on_load: Optional[Callable[[Any], None]] = None):
+        """
+        Args:
+            name: Absolute module name, e.g. "google.generativeai"
+            on_load: Called once with the module right after it is imported
+        """
+        self._name = name
+        self._on_load = on_load
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> Any:
+        with self._lock:
+            if self._module is None:
+                module = importlib.import_module(self._name)
+                if self._on_load is not None:
+                    self._on_load(module)
+                self._module = module
+            return self._module
+
+    def __getattr__(self, attr: str) -> Any:
+        module = self._module if self._module is not None else self._load()
+        return getattr(module, attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+class LazyObject:
+    """
+    Stand-in for an object, e.g. an API client, built on first attribute access.
+    """
+
+    def __init__(self, factory: Callable[[], Any]):
+        """
+        Args:
+            factory: Builds the object; called at most once
+        """
+        self._factory = factory
+        self._target = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> Any:
+        with self._lock:
+            if self._target is None:
+                self._target = self._factory()
+            return self._target
+
+    def __getattr__(self, attr: str) -> Any:
+        target = self._target if self._target is not None else self._load()
+        return getattr(target, attr)
@@ -0,0 +1,118 @@
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+
+from refresh_lock import atomic_write_json
+
+
+class LLMResponseCache:
+    """
+    Content-addressed cache of LLM responses.
+
+    Entries are keyed by a hash of everything that determines the response
+    (model name, system instruction, section name and metric payload), so a
+    section whose metrics have not changed is served locally instead of paying
+    for another generation. Entries expire after a TTL and the least recently
+    used ones are evicted beyond max_entries. The cache is persisted to a JSON
+    file so it survives between refreshes.
+    """
+
+    def __init__(
+        self,
+        cache_path: Optional[str] = None,
+        ttl_seconds: float = 6 * 60 * 60,
+        max_entries: int = 256,
+    ):
+        """
+        Args:
+            cache_path: JSON file to persist entries to, or None for memory only
+            ttl_seconds: Maximum age of an entry
+            max_entries: Number of entries kept before LRU eviction
+        """
+        self.cache_path = cache_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load()
+
+    @staticmethod
+    def make_key(
+        model_name: str, system_instruction: str, section: str, payload: List[str]
+    ) -> str:
+        """Hash the inputs that determine a section's response."""
+        material = json.dumps(
+            [model_name, system_instruction, section, payload], ensure_ascii=False
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _load(self) -> None:
+        if not self.cache_path:
+            return
+        try:
+            with open(self.cache_path, "r") as f:
+                entries = json.load(f)
+        except (json.JSONDecodeError, FileNotFoundError, ValueError):
+            return
+        # Stored oldest access first, so LRU order survives a reload
+        for key, entry in entries.items():
+            self._entries[key] = entry
+
+    def _save(self) -> None:
+        if self.cache_path:
+            atomic_write_json(self.cache_path, self._entries)
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for a key, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry["created"] > self.ttl_seconds:
+                del self._entries[key]
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.saved_seconds += entry["latency"]
+            return entry["response"]
+
+    def put(self, key: str, response: str, latency: float) -> None:
+        """
+        Store a response.
+
+        Args:
+            key: Key from make_key
+            response: Raw response text
+            latency: Seconds the generation took, credited on later hits
+        """
+        with self._lock:
+            self._entries[key] = {
+                "response": response,
+                "latency": latency,
+                "created": time.time(),
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._save()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit, miss and saved-latency counters since this cache was created."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "saved_seconds": self.saved_seconds,
+                "entries": len(self._entries),
+            }
@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+from typing import List, Dict, Optional, Tuple
+
+# A metric series as (dates, values), with dates ascending as datetime64[ns]
+Series = Tuple[np.ndarray, np.ndarray]
+
+
+# Timestamp layout of Dune result rows, e.g. "2024-12-16 00:00:00.000 UTC"
+DUNE_DATE_FORMAT = "%Y-%m-%d %H:%M:%S.%f UTC"
+
+
+def parse_dates(column: pd.Series) -> np.ndarray:
+    """Parse a date column into naive UTC datetime64[ns] values."""
+    try:
+        parsed = pd.to_datetime(column, utc=True, format=DUNE_DATE_FORMAT)
+    except (ValueError, TypeError):
+        parsed = pd.to_datetime(column, utc=True)
+    return parsed.dt.tz_localize(None).to_numpy(dtype="datetime64[ns]")
+
+
+def prepare_series(df: pd.DataFrame, value_column: str, date_column: str) -> Series:
+    """
+    Extract a metric series from a DataFrame, sorted once by date.
+
+    Args:
+        df: Result rows of a Dune query
+        value_column: Column holding the metric value
+        date_column: Column holding the observation date
+
+    Returns:
+        Series: Ascending datetime64 dates and float64 values
+    """
+    dates = parse_dates(df[date_column])
+    values = df[value_column].to_numpy(dtype=np.float64)
+    order = np.argsort(dates, kind="stable")
+    return dates[order], values[order]
+
+
+def compute_changes(
+    dates: np.ndarray, values: np.ndarray, lookback_periods: List[tuple]
+) -> Dict[str, Optional[float]]:
+    """
+    Calculate percentage changes from the latest value over several horizons.
+
+    Each horizon compares the latest value against the most recent value
+    observed on or before `latest date - days`. Horizons with no such value,
+    or whose past value is zero or missing, are reported as None.
+
+    Args:
+        dates: Ascending datetime64 dates
+        values: Values aligned with dates
+        lookback_periods: List of tuples (number_of_days, period_label)
+
+    Returns:
+        Dict[str, Optional[float]]: "current" value followed by each period label
+    """
+    return compute_changes_batch({"": (dates, values)}, lookback_periods)[""]
+
+
+def compute_changes_batch(
+    series: Dict[str, Series], lookback_periods: List[tuple]
+) -> Dict[str, Dict[str, Optional[float]]]:
+    """
+    Calculate changes for several metric series over the same horizons.
+
+    All series are laid end to end on a single time axis, each shifted far
+    enough past the previous one that no lookback can reach into it, so every
+    horizon of every series resolves with one searchsorted call.
+
+    Args:
+        series: Metric name to (dates, values) series, each non-empty
+        lookback_periods: List of tuples (number_of_days, period_label)
+
+    Returns:
+        Dict[str, Dict[str, Optional[float]]]: Changes keyed by metric name
+    """
+    if not series:
+        return {}
+
+    names = list(series)
+    seconds = [
+        series[name][0].astype("datetime64[s]").astype(np.int64) for name in names
+    ]
+    values = np.concatenate(
+        [np.asarray(series[name][1], dtype=np.float64) for name in names]
+    )
+    lengths = np.array([len(s) for s in seconds])
+    if not lengths.all():
+        raise IndexError("cannot calculate changes for an empty series")
+
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+    lookback_seconds = (
+        np.array([days for days, _ in lookback_periods], dtype=np.int64) * 86400
+    )
+
+    # Shift each series onto its own segment of the time axis
+    origin = min(s[0] for s in seconds)
+    span = max(s[-1] for s in seconds) - origin + lookback_seconds.max(initial=0) + 1
+    axis = np.concatenate([s - origin + i * span for i, s in enumerate(seconds)])
+
+    current = values[ends - 1]
+    lookup = axis[ends - 1][:, None] - lookback_seconds[None, :]
+    # Index of the last observation on or before each lookup date
+    indices = (
+        np.searchsorted(axis, lookup.ravel(), side="right").reshape(lookup.shape) - 1
+    )
+
+    valid = indices >= starts[:, None]
+    past = np.where(valid, values[np.clip(indices, 0, None)], np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        changes = (current[:, None] - past) / past * 100
+
+    results = {}
+    for row, name in enumerate(names):
+        result = {"current": float(current[row])}
+        for col, (_, label) in enumerate(lookback_periods):
+            change = changes[row, col]
+            result[label] = float(change) if np.isfinite(change) else None
+        results[name] = result
+
+    return results
@@ -0,0 +1,139 @@
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+from metric_changes import Series
+from metric_specs import DerivedSpec
+
+# Days between two rows of an aligned frame
+FREQUENCY_DAYS = {"D": 1, "W": 7}
+
+
+def _buckets(dates: np.ndarray, frequency: str) -> np.ndarray:
+    """Row number of each date on the frequency's grid."""
+    days = np.asarray(dates, dtype="datetime64[D]").astype(np.int64)
+    if frequency == "W":
+        # Day 0, 1970-01-01, is a Thursday; weeks start on Mondays
+        return (days + 3) // 7
+    return days
+
+
+def align_series(
+    series: Dict[str, Series], frequency: str
+) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+    """
+    Lay several series on one daily or weekly grid, as columns of one frame.
+
+    Each series keeps its last observation per day or week. Rows between its
+    observations are forward-filled, so a weekly series resampled to days
+    holds its value for the week; rows before its first observation are NaN.
+    All series are scattered into the frame in one pass.
+
+    Args:
+        series: Metric name to ascending (dates, values)
+        frequency: "D" or "W"
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, List[str]]: Row dates as
+        datetime64[D] (week starts for "W"), the rows x names frame, and
+        the column names
+    """
+    names = list(series)
+    buckets, values = [], []
+    for name in names:
+        dates, column = series[name]
+        column = np.asarray(column, dtype=np.float64)
+        finite = np.isfinite(column)
+        buckets.append(_buckets(dates, frequency)[finite])
+        values.append(column[finite])
+
+    lengths = np.array([len(b) for b in buckets])
+    if not lengths.all():
+        raise IndexError("cannot align an empty series")
+    start = min(b[0] for b in buckets)
+    rows = int(max(b[-1] for b in buckets) - start + 1)
+
+    # Flat frame positions ascend within each column, and columns follow
+    # each other, so the last entry of each run of equal positions is the
+    # last observation of that row
+    columns = np.repeat(np.arange(len(names)), lengths)
+    positions = np.concatenate(buckets) - start + columns * rows
+    flat_values = np.concatenate(values)
+    last = np.flatnonzero(np.diff(positions, append=positions[-1] + 1) != 0)
+
+    frame = np.full(len(names) * rows, np.nan)
+    frame[positions[last]] = flat_values[last]
+    frame = frame.reshape(len(names), rows).T
+
+    # Forward-fill: every row takes the latest row at or above it with data
+    filled = np.where(np.isnan(frame), 0, np.arange(rows)[:, None])
+    np.maximum.accumulate(filled, axis=0, out=filled)
+    frame = frame[filled, np.arange(len(names))]
+
+    grid = np.arange(start, start + rows)
+    if frequency == "W":
+        grid = grid * 7 - 3
+    return grid.astype("datetime64[D]"), frame, names
+
+
+def compute_derived(
+    series: Dict[str, Series], specs: List[DerivedSpec]
+) -> Dict[str, Dict[str, Optional[float]]]:
+    """
+    Calculate derived indicators and their changes over several horizons.
+
+    Specs sharing a frequency are computed together: their inputs are
+    aligned into one frame, every ratio is one column operation over it and
+    every horizon one row lookup, with no per-spec arithmetic. A horizon
+    compares the latest row against the row on or before `latest - days`.
+    Specs whose inputs are missing are left out.
+
+    Args:
+        series: Metric spec key to ascending (dates, values)
+        specs: Derived indicators to compute
+
+    Returns:
+        Dict[str, Dict[str, Optional[float]]]: "current" value followed by
+        each period label, keyed by derived spec key, like
+        compute_changes_batch
+    """
+    groups: Dict[str, List[DerivedSpec]] = {}
+    for spec in specs:
+        if spec.numerator in series and spec.denominator in series:
+            groups.setdefault(spec.frequency, []).append(spec)
+
+    results = {}
+    for frequency, group in groups.items():
+        inputs = sorted({s.numerator for s in group} | {s.denominator for s in group})
+        _, frame, names = align_series({k: series[k] for k in inputs}, frequency)
+        column = {name: i for i, name in enumerate(names)}
+
+        numerators = frame[:, [column[s.numerator] for s in group]]
+        denominators = frame[:, [column[s.denominator] for s in group]]
+        scale = np.array([s.scale for s in group])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            derived = numerators / denominators * scale
+        derived[~np.isfinite(derived)] = np.nan
+
+        horizons = sorted({days for s in group for days, _ in s.lookbacks})
+        step = FREQUENCY_DAYS[frequency]
+        # Rows back to the latest row on or before each horizon
+        offsets = -(-np.array(horizons, dtype=np.int64) // step)
+        rows = len(derived) - 1 - offsets
+        current = derived[-1]
+        past = np.where(
+            (rows >= 0)[:, None], derived[np.clip(rows, 0, None)], np.nan
+        )
+        with np.errstate(divide="ignore", invalid="ignore"):
+            changes = (current[None, :] - past) / past * 100
+
+        horizon_row = {days: i for i, days in enumerate(horizons)}
+        for k, spec in enumerate(group):
+            if not np.isfinite(current[k]):
+                continue
+            result: Dict[str, Optional[float]] = {"current": float(current[k])}
+            for days, label in spec.lookbacks:
+                change = changes[horizon_row[days], k]
+                result[label] = float(change) if np.isfinite(change) else None
+            results[spec.key] = result
+
+    return results
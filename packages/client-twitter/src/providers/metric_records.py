@@ -0,0 +1,170 @@
+import re
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from game_history import GameTrend, describe_trend
+from metric_stats import MetricStats
+from ndjson_records import make_record
+
+
+@dataclass(frozen=True, slots=True)
+class MetricRecord:
+    """
+    One knowledge base metric, kept typed until it is rendered for a prompt.
+
+    Attributes:
+        name: Label the formatted metric line starts with
+        section: Synthesis section the metric belongs to
+        value: Headline value
+        changes: Percentage change keyed by period label, None if unknown
+        query_id: Dune query the metric was derived from
+        style: Key into FORMATTERS choosing how the line is rendered
+        counts: (label, value) figures shown alongside the headline value
+        stats: Rolling statistics of the metric's series, if tracked
+        trend: Rank movement and growth acceleration of a game, if tracked
+    """
+
+    name: str
+    section: str
+    value: float
+    changes: Dict[str, Optional[float]] = field(default_factory=dict)
+    query_id: Optional[int] = None
+    style: str = "series"
+    counts: Tuple[Tuple[str, float], ...] = ()
+    stats: Optional[MetricStats] = None
+    trend: Optional[GameTrend] = None
+
+    @property
+    def text(self) -> str:
+        """The human readable metric line."""
+        return FORMATTERS[self.style](self)
+
+    def record(self) -> Dict[str, Any]:
+        """Streaming output record of this metric."""
+        return make_record("dune", "metric", self.section, self.text, self.query_id)
+
+
+def format_change_line(
+    name: str,
+    current: float,
+    changes: Dict[str, Optional[float]],
+    include_value: bool = True,
+) -> str:
+    """Format metric with its changes into a human readable string."""
+    parts = [f"{name}: {current:,.0f}"] if include_value else [name]
+
+    for period, change in changes.items():
+        if period != "current" and change is not None:
+            direction = "up" if change > 0 else "down"
+            parts.append(f"{period} change: {abs(change):.1f}% {direction}")
+
+    return " | ".join(parts)
+
+
+def _format_series(record: MetricRecord) -> str:
+    return format_change_line(record.name, record.value, record.changes)
+
+
+def _format_ratio(record: MetricRecord) -> str:
+    # Ratios such as fees per transaction can be far below one
+    value = record.value
+    head = f"{value:,.0f}" if abs(value) >= 100 else f"{value:.4g}"
+    return format_change_line(f"{record.name}: {head}", value, record.changes, False)
+
+
+def _format_price(record: MetricRecord) -> str:
+    return f"{record.name}: ${record.value:.2f}"
+
+
+def _format_activity(record: MetricRecord) -> str:
+    # counts and changes pair up in order, e.g. DAU with the 1d change
+    parts = []
+    for (label, count), (period, change) in zip(
+        record.counts, record.changes.items()
+    ):
+        part = f"{label} {count:,.0f}" if count is not None else f"{label} n/a"
+        if change is not None:
+            part += f" ({change:+.1f}% {period})"
+        parts.append(part)
+    if record.trend is not None:
+        parts.append(describe_trend(record.trend))
+    return f"{record.name}: " + " | ".join(parts)
+
+
+def _format_totals(record: MetricRecord) -> str:
+    return f"{record.name}: " + " | ".join(
+        f"{count:,.0f} {label}" for label, count in record.counts
+    )
+
+
+# How each MetricRecord style is rendered into a metric line
+FORMATTERS: Dict[str, Callable[[MetricRecord], str]] = {
+    "series": _format_series,
+    "ratio": _format_ratio,
+    "price": _format_price,
+    "activity": _format_activity,
+    "totals": _format_totals,
+}
+
+
+class SectionRouter:
+    """
+    Index assigning metric lines to synthesis sections.
+
+    Typed records carry their section and are routed on it directly. Plain
+    lines, e.g. from RPC callers, are looked up by their label (the text
+    before the first colon) in a dict of known labels, then matched against
+    one precompiled alternation of fallback patterns, so routing costs one
+    lookup or one regex match per line whatever the number of rules.
+    """
+
+    def __init__(
+        self,
+        labels: Optional[Dict[str, str]] = None,
+        patterns: Iterable[Tuple[str, str]] = (),
+    ):
+        """
+        Args:
+            labels: Section keyed by exact metric label, e.g. "Current RON Price"
+            patterns: (regex, section) fallbacks for unknown labels, tried in
+                order against the whole line
+        """
+        self.labels = dict(labels or {})
+        self._sections: List[str] = []
+        alternatives = []
+        for i, (pattern, section) in enumerate(patterns):
+            alternatives.append(f"(?P<p{i}>{pattern})")
+            self._sections.append(section)
+        self._pattern = re.compile("|".join(alternatives)) if alternatives else None
+
+    def section(self, metric: Union[MetricRecord, str]) -> Optional[str]:
+        """Section of a record or metric line, or None if no rule matches."""
+        if isinstance(metric, MetricRecord):
+            return metric.section
+        section = self.labels.get(metric.split(":", 1)[0].strip())
+        if section is None and self._pattern is not None:
+            match = self._pattern.match(metric)
+            if match is not None:
+                section = self._sections[int(match.lastgroup[1:])]
+        return section
+
+    def route(
+        self, metrics: Iterable[Union[MetricRecord, str]]
+    ) -> Dict[str, List[str]]:
+        """
+        Group metrics by section, rendering each into its metric line.
+
+        Lines matching no rule are dropped with a printed warning.
+
+        Returns:
+            Dict[str, List[str]]: Metric lines keyed by section, in input order
+        """
+        routed: Dict[str, List[str]] = {}
+        for metric in metrics:
+            section = self.section(metric)
+            text = metric.text if isinstance(metric, MetricRecord) else metric
+            if section is None:
+                print(f"No section for metric line: {text}")
+                continue
+            routed.setdefault(section, []).append(text)
+        return routed
@@ -0,0 +1,135 @@
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Tuple
+
+# Metric specs shipped with the analytics
+DEFAULT_SPECS_PATH = Path(__file__).parent / "metric_specs.json"
+
+# Derived indicators shipped with the analytics
+DEFAULT_DERIVED_PATH = Path(__file__).parent / "derived_metrics.json"
+
+# Time grids derived indicators can be aligned on: daily and weekly
+FREQUENCIES = ("D", "W")
+
+
+@dataclass(frozen=True)
+class MetricSpec:
+    """
+    A time-series metric read from one column of a Dune query.
+
+    Attributes:
+        key: Stable identifier, also the metric's key in the local history
+        name: Label the formatted metric line starts with
+        query_id: Dune query holding the series
+        value_column: Column holding the metric value
+        date_column: Column holding the observation date
+        section: Synthesis section the metric belongs to
+        lookbacks: (number_of_days, period_label) horizons to report
+    """
+
+    key: str
+    name: str
+    query_id: int
+    value_column: str
+    date_column: str
+    section: str
+    lookbacks: Tuple[Tuple[int, str], ...]
+
+
+@dataclass(frozen=True)
+class DerivedSpec:
+    """
+    An indicator computed as the ratio of two metric spec series.
+
+    Attributes:
+        key: Stable identifier, distinct from every metric spec key
+        name: Label the formatted metric line starts with
+        numerator: Key of the metric spec divided
+        denominator: Key of the metric spec divided by
+        frequency: "D" or "W", the grid both series are aligned on
+        section: Synthesis section the indicator belongs to
+        lookbacks: (number_of_days, period_label) horizons to report
+        scale: Factor the ratio is multiplied by
+    """
+
+    key: str
+    name: str
+    numerator: str
+    denominator: str
+    frequency: str
+    section: str
+    lookbacks: Tuple[Tuple[int, str], ...]
+    scale: float = 1.0
+
+
+def load_metric_specs(path: str = str(DEFAULT_SPECS_PATH)) -> List[MetricSpec]:
+    """
+    Load metric specs from a JSON list of objects with MetricSpec's fields.
+
+    Raises:
+        ValueError: If a spec is missing a field, has an unknown one, or
+            reuses another spec's key
+    """
+    with open(path, "r") as f:
+        raw_specs = json.load(f)
+
+    specs = []
+    for raw in raw_specs:
+        try:
+            spec = MetricSpec(
+                **{
+                    **raw,
+                    "query_id": int(raw["query_id"]),
+                    "lookbacks": tuple(
+                        (int(days), str(label)) for days, label in raw["lookbacks"]
+                    ),
+                }
+            )
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"Invalid metric spec {raw!r}: {str(e)}") from e
+        specs.append(spec)
+
+    keys = [spec.key for spec in specs]
+    duplicates = {key for key in keys if keys.count(key) > 1}
+    if duplicates:
+        raise ValueError(f"Duplicate metric spec keys: {sorted(duplicates)}")
+
+    return specs
+
+
+def load_derived_specs(path: str = str(DEFAULT_DERIVED_PATH)) -> List[DerivedSpec]:
+    """
+    Load derived indicators from a JSON list of objects with DerivedSpec's fields.
+
+    Raises:
+        ValueError: If a spec is missing a field, has an unknown one or an
+            unknown frequency, or reuses another spec's key
+    """
+    with open(path, "r") as f:
+        raw_specs = json.load(f)
+
+    specs = []
+    for raw in raw_specs:
+        try:
+            spec = DerivedSpec(
+                **{
+                    **raw,
+                    "scale": float(raw.get("scale", 1.0)),
+                    "lookbacks": tuple(
+                        (int(days), str(label)) for days, label in raw["lookbacks"]
+                    ),
+                }
+            )
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"Invalid derived spec {raw!r}: {str(e)}") from e
+        if spec.frequency not in FREQUENCIES:
+            raise ValueError(f"Invalid derived spec {raw!r}: unknown frequency")
+        specs.append(spec)
+
+    keys = [spec.key for spec in specs]
+    duplicates = {key for key in keys if keys.count(key) > 1}
+    if duplicates:
+        raise ValueError(f"Duplicate derived spec keys: {sorted(duplicates)}")
+
+    return specs
@@ -0,0 +1,320 @@
+from __future__ import annotations
+
+import json
+import math
+import threading
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from lazy_imports import LazyModule
+from refresh_lock import atomic_write_json
+
+# Imported on first use, so importing MetricStats stays cheap
+np = LazyModule("numpy")
+
+
+@dataclass(frozen=True, slots=True)
+class MetricStats:
+    """
+    Rolling statistics of a metric at its latest scored observation.
+
+    The observation is scored against the statistics of the observations
+    before it, so a jump does not dampen its own z-score.
+
+    Attributes:
+        date: ISO date of the scored observation
+        value: The scored observation
+        mean: Mean of the preceding window
+        std: Sample standard deviation of the preceding window
+        ewma: Exponentially weighted mean before the observation
+        ewm_std: Exponentially weighted standard deviation before it
+        zscore: (value - mean) / std, None while the window is too short
+        ewma_zscore: (value - ewma) / ewm_std, None without spread
+        window: Number of observations the mean and std cover
+        anomalous: Whether |zscore| reached the engine's threshold over a
+            full window
+    """
+
+    date: str
+    value: float
+    mean: float
+    std: float
+    ewma: float
+    ewm_std: float
+    zscore: Optional[float]
+    ewma_zscore: Optional[float]
+    window: int
+    anomalous: bool
+
+
+def describe_anomaly(name: str, stats: MetricStats) -> str:
+    """One-line description of an anomalous observation for a prompt."""
+    direction = "above" if (stats.zscore or 0) > 0 else "below"
+    return (
+        f"{name} on {stats.date}: {stats.value:,.0f} is "
+        f"{abs(stats.zscore or 0):.1f} standard deviations {direction} its "
+        f"{stats.window}-observation mean of {stats.mean:,.0f} "
+        f"(EWMA {stats.ewma:,.0f})"
+    )
+
+
+def rolling_zscores(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    Z-score of every observation against the window observations before it.
+
+    Window sums come from cumulative sums, so the whole history is scored in
+    a few vectorized passes.
+
+    Returns:
+        np.ndarray: Z-scores, NaN until the window is full or where the
+        window has no spread
+    """
+    values = np.asarray(values, dtype=np.float64)
+    scores = np.full(len(values), np.nan)
+    if len(values) <= window or window < 2:
+        return scores
+
+    # Centering keeps the squared sums well within float64 precision
+    x = values - values[0]
+    sums = np.concatenate(([0.0], np.cumsum(x)))
+    squares = np.concatenate(([0.0], np.cumsum(x * x)))
+    ends = np.arange(window, len(x))
+    total = sums[ends] - sums[ends - window]
+    total_sq = squares[ends] - squares[ends - window]
+    mean = total / window
+    var = np.maximum(total_sq - total * mean, 0.0) / (window - 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = (x[ends] - mean) / np.sqrt(var)
+    scores[ends] = np.where(var > 0, z, np.nan)
+    return scores
+
+
+class MetricStatsEngine:
+    """
+    Online rolling mean/variance, EWMA and z-scores per metric.
+
+    Each metric keeps the last window observations with their running sum
+    and sum of squares, and exponentially weighted first and second moments,
+    so absorbing an observation takes constant time whatever the length of
+    the history. Only observations newer than the last absorbed one are fed
+    in on each update; the latest observation of a series is left out since
+    the current day or week is still accumulating. A metric seen for the
+    first time, or with more new observations than its window, is rebuilt
+    from its history in vectorized passes instead. State is persisted to a
+    JSON file so one-shot runs pick up where the previous one stopped.
+    """
+
+    def __init__(
+        self,
+        state_path: Optional[str] = None,
+        window: int = 30,
+        alpha: float = 0.1,
+        z_threshold: float = 3.0,
+    ):
+        """
+        Args:
+            state_path: JSON file to persist state to, or None for memory only
+            window: Observations the rolling mean and variance cover
+            alpha: Weight of the newest observation in the EWMA
+            z_threshold: Absolute rolling z-score at which an observation is
+                flagged as anomalous
+        """
+        if window < 2:
+            raise ValueError("window must be at least 2")
+        self.state_path = state_path
+        self.window = window
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        self._metrics: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        if not self.state_path:
+            return
+        try:
+            with open(self.state_path, "r") as f:
+                metrics = json.load(f)
+        except (json.JSONDecodeError, FileNotFoundError, ValueError):
+            return
+        # Windows are held as bounded deques, persisted as lists
+        for state in metrics.values():
+            state["buffer"] = deque(state["buffer"], maxlen=state["window"])
+        self._metrics = metrics
+
+    def _save(self) -> None:
+        if self.state_path:
+            atomic_write_json(
+                self.state_path,
+                {
+                    metric: dict(state, buffer=list(state["buffer"]))
+                    for metric, state in self._metrics.items()
+                },
+            )
+
+    def _bootstrap(self, dates: np.ndarray, values: np.ndarray) -> Dict[str, Any]:
+        """State after every observation but the last, computed vectorized."""
+        center = float(values[0])
+        x = values[:-1] - center
+        buffer = x[-self.window :]
+
+        ewma = ewm_sq = 0.0
+        if len(x):
+            # Weights of the recursive EWMA seeded with the first observation
+            weights = self.alpha * (1 - self.alpha) ** np.arange(len(x) - 1, -1, -1)
+            weights[0] = (1 - self.alpha) ** (len(x) - 1)
+            ewma = float(weights @ x)
+            ewm_sq = float(weights @ (x * x))
+
+        return {
+            "window": self.window,
+            "alpha": self.alpha,
+            "center": center,
+            "last_date": int(dates[-2]) if len(x) else None,
+            "count": len(x),
+            "buffer": deque(buffer.tolist(), maxlen=self.window),
+            "sum": float(buffer.sum()),
+            "sum_sq": float((buffer * buffer).sum()),
+            "ewma": ewma,
+            "ewm_sq": ewm_sq,
+            "scored": None,
+        }
+
+    def _absorb(self, state: Dict[str, Any], date: int, value: float) -> None:
+        """Score one observation against the state, then add it to the state."""
+        center = state["center"]
+        x = value - center
+        buffer: Deque[float] = state["buffer"]
+        n = len(buffer)
+
+        mean = state["sum"] / n if n else x
+        var = (state["sum_sq"] - state["sum"] * mean) / (n - 1) if n > 1 else 0.0
+        std = math.sqrt(max(var, 0.0))
+        zscore = (x - mean) / std if std > 0 else None
+
+        ewm_var = max(state["ewm_sq"] - state["ewma"] ** 2, 0.0)
+        ewm_std = math.sqrt(ewm_var)
+        ewma_zscore = (
+            (x - state["ewma"]) / ewm_std if state["count"] and ewm_std > 0 else None
+        )
+
+        state["scored"] = asdict(
+            MetricStats(
+                date=str(np.datetime_as_string(np.datetime64(date, "ns"), unit="D")),
+                value=value,
+                mean=mean + center,
+                std=std,
+                ewma=state["ewma"] + center,
+                ewm_std=ewm_std,
+                zscore=zscore,
+                ewma_zscore=ewma_zscore,
+                window=n,
+                anomalous=(
+                    n >= self.window
+                    and zscore is not None
+                    and abs(zscore) >= self.z_threshold
+                ),
+            )
+        )
+
+        if len(buffer) == self.window:
+            # The bounded deque drops its oldest observation on append
+            old = buffer[0]
+            state["sum"] -= old
+            state["sum_sq"] -= old * old
+        buffer.append(x)
+        state["sum"] += x
+        state["sum_sq"] += x * x
+
+        if state["count"]:
+            state["ewma"] += self.alpha * (x - state["ewma"])
+            state["ewm_sq"] += self.alpha * (x * x - state["ewm_sq"])
+        else:
+            state["ewma"], state["ewm_sq"] = x, x * x
+        state["count"] += 1
+        state["last_date"] = date
+
+    def _update(
+        self, metric: str, dates: np.ndarray, values: np.ndarray
+    ) -> Tuple[Optional[MetricStats], bool]:
+        """Bring one metric up to date; returns its stats and whether it changed."""
+        dates = np.asarray(dates, dtype="datetime64[ns]").astype(np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        finite = np.isfinite(values)
+        dates, values = dates[finite], values[finite]
+        # The latest observation may still be accumulating
+        closed = len(dates) - 1
+        if closed < 1:
+            return None, False
+        dates, values = dates[:closed], values[:closed]
+
+        state = self._metrics.get(metric)
+        start = None
+        if (
+            state is not None
+            and state["window"] == self.window
+            and state["alpha"] == self.alpha
+            and state["last_date"] is not None
+        ):
+            start = int(np.searchsorted(dates, state["last_date"], side="right"))
+            # Rebuild when the history no longer contains the last absorbed
+            # date, or when replaying would cost more than rebuilding
+            if (
+                start == 0
+                or dates[start - 1] != state["last_date"]
+                or closed - start > self.window
+            ):
+                start = None
+
+        if start is None:
+            state = self._bootstrap(dates, values)
+            start = closed - 1
+        elif start == closed:
+            return (MetricStats(**state["scored"]) if state["scored"] else None), False
+
+        for date, value in zip(dates[start:].tolist(), values[start:].tolist()):
+            self._absorb(state, date, value)
+        self._metrics[metric] = state
+        return MetricStats(**state["scored"]), True
+
+    def update_many(
+        self, series: Dict[str, Tuple[np.ndarray, np.ndarray]]
+    ) -> Dict[str, Optional[MetricStats]]:
+        """
+        Absorb the closed observations not seen yet of several metrics.
+
+        State is loaded and saved once for the whole batch.
+
+        Args:
+            series: Metric key to ascending (dates, values), e.g. from
+                MetricStore.load
+
+        Returns:
+            Dict[str, Optional[MetricStats]]: Statistics at each metric's
+            latest closed observation, None if its series has none
+        """
+        with self._lock:
+            self._load()
+            results, changed = {}, False
+            for metric, (dates, values) in series.items():
+                results[metric], updated = self._update(metric, dates, values)
+                changed = changed or updated
+            if changed:
+                self._save()
+            return results
+
+    def update(
+        self, metric: str, dates: np.ndarray, values: np.ndarray
+    ) -> Optional[MetricStats]:
+        """Absorb one metric's new closed observations; see update_many."""
+        return self.update_many({metric: (dates, values)})[metric]
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Latest scored statistics per metric."""
+        with self._lock:
+            return {
+                metric: state["scored"]
+                for metric, state in self._metrics.items()
+                if state.get("scored")
+            }
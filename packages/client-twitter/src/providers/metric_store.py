@@ -0,0 +1,115 @@
+import os
+import numpy as np
+from pathlib import Path
+from typing import Tuple
+
+# A metric series as (dates, values), with dates ascending as datetime64[ns]
+Series = Tuple[np.ndarray, np.ndarray]
+
+DATES_FILE = "dates.i8"
+VALUES_FILE = "values.f8"
+
+
+class MetricStore:
+    """
+    Append-only local history of metric series.
+
+    Each metric is kept as two flat binary columns on disk, one of datetime64[ns]
+    dates and one of float64 values, so history reopens as memory-mapped arrays
+    without parsing or copying. Merging a fresh Dune payload only appends the
+    observations newer than the stored history and rewrites the latest one in
+    place, since the current day or week is still accumulating.
+    """
+
+    def __init__(self, store_dir: str):
+        """
+        Args:
+            store_dir: Directory holding one subdirectory per metric
+        """
+        self.store_dir = Path(store_dir)
+
+    def _metric_dir(self, metric: str) -> Path:
+        return self.store_dir / metric
+
+    def load(self, metric: str) -> Series:
+        """
+        Open the stored history of a metric as read-only memory maps.
+
+        Returns:
+            Series: Ascending dates and values, empty if nothing is stored
+        """
+        metric_dir = self._metric_dir(metric)
+        try:
+            # A merge interrupted between the two appends leaves one column
+            # longer; only the rows present in both are part of the history
+            length = min(
+                os.path.getsize(metric_dir / DATES_FILE) // 8,
+                os.path.getsize(metric_dir / VALUES_FILE) // 8,
+            )
+        except FileNotFoundError:
+            length = 0
+
+        if length == 0:
+            return (
+                np.empty(0, dtype="datetime64[ns]"),
+                np.empty(0, dtype=np.float64),
+            )
+
+        dates = np.memmap(
+            metric_dir / DATES_FILE, dtype="datetime64[ns]", mode="r", shape=(length,)
+        )
+        values = np.memmap(
+            metric_dir / VALUES_FILE, dtype=np.float64, mode="r", shape=(length,)
+        )
+        return dates, values
+
+    def merge(self, metric: str, dates: np.ndarray, values: np.ndarray) -> int:
+        """
+        Merge a freshly downloaded series into the stored history.
+
+        Args:
+            metric: Metric key
+            dates: Ascending datetime64 dates
+            values: Values aligned with dates
+
+        Returns:
+            int: Number of observations appended
+        """
+        dates = np.asarray(dates, dtype="datetime64[ns]")
+        values = np.asarray(values, dtype=np.float64)
+        if len(dates) == 0:
+            return 0
+
+        metric_dir = self._metric_dir(metric)
+        os.makedirs(metric_dir, exist_ok=True)
+        stored_dates, _ = self.load(metric)
+        length = len(stored_dates)
+
+        if length:
+            last_date = stored_dates[-1]
+            # Refresh the latest stored observation in place
+            same = np.flatnonzero(dates == last_date)
+            if len(same):
+                with open(metric_dir / VALUES_FILE, "r+b") as f:
+                    f.seek((length - 1) * 8)
+                    f.write(values[same[-1]].tobytes())
+            start = np.searchsorted(dates, last_date, side="right")
+        else:
+            start = 0
+
+        new_dates = dates[start:]
+        new_values = values[start:]
+        if len(new_dates) == 0:
+            return 0
+
+        # Drop anything past the common length before appending
+        for name in (DATES_FILE, VALUES_FILE):
+            with open(metric_dir / name, "ab") as f:
+                f.truncate(length * 8)
+
+        with open(metric_dir / VALUES_FILE, "ab") as f:
+            f.write(new_values.tobytes())
+        with open(metric_dir / DATES_FILE, "ab") as f:
+            f.write(new_dates.tobytes())
+
+        return len(new_dates)
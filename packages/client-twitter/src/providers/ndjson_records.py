@@ -0,0 +1,37 @@
+import json
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Optional, TextIO
+
+
+def make_record(
+    source: str,
+    kind: str,
+    section: Optional[str],
+    text: str,
+    query_id: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Build a streaming output record for one metric line or insight.
+
+    Args:
+        source: Producer of the record, e.g. "dune" or "gemini"
+        kind: "metric" for knowledge base lines, "insight" for LLM output
+        section: Section or category the record belongs to, if any
+        text: The metric line or insight itself
+        query_id: Dune query the record was derived from, if any
+    """
+    return {
+        "source": source,
+        "kind": kind,
+        "section": section,
+        "query_id": query_id,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "text": text,
+    }
+
+
+def write_records(records: Iterable[Dict[str, Any]], out: TextIO) -> None:
+    """Write each record as one JSON line, flushing so consumers see it at once."""
+    for record in records:
+        out.write(json.dumps(record) + "\n")
+        out.flush()
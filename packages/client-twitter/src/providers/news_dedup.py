@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import re
+import json
+import time
+import hashlib
+import threading
+from typing import List, Dict, Any, Optional, Set
+
+from lazy_imports import LazyModule
+from refresh_lock import atomic_write_json
+
+# Imported on first use; callers that only import normalize skip numpy
+np = LazyModule("numpy")
+
+# Mersenne prime the MinHash permutations are computed modulo
+_PRIME = (1 << 31) - 1
+
+# Leading "[2025-01-01 12:00] [Category] " tags of an insight line
+_TAGS = re.compile(r"^(\s*\[[^\]]*\]\s*)+")
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+_WORD = re.compile(r"[a-z0-9]+(?:[.,][0-9]+)*")
+
+
+def normalize(text: str) -> str:
+    """Lowercase an insight, dropping its tags, punctuation and extra spaces."""
+    return " ".join(_WORD.findall(_TAGS.sub("", text).lower()))
+
+
+class NewsDedupIndex:
+    """
+    Persistent index of news insights already handed downstream.
+
+    Each insight is normalized (tags, case and punctuation removed) and
+    checked first against exact hashes, then against MinHash signatures of
+    its word shingles, bucketed by LSH bands so only likely matches are
+    compared. A near duplicate whose numbers differ from the match counts as
+    materially changed and is let through. Entries are persisted to a JSON
+    file so consecutive refreshes share them, and expire a time window after
+    they were first seen, so a story that keeps reappearing is handed out
+    again once per window.
+    """
+
+    def __init__(
+        self,
+        index_path: Optional[str] = None,
+        window_seconds: float = 48 * 60 * 60,
+        threshold: float = 0.7,
+        num_perm: int = 64,
+        bands: int = 16,
+        shingle_size: int = 3,
+        seed: int = 1,
+    ):
+        """
+        Args:
+            index_path: JSON file to persist entries to, or None for memory only
+            window_seconds: How long an insight suppresses its duplicates
+            threshold: Estimated Jaccard similarity at which two insights
+                count as near duplicates
+            num_perm: Number of MinHash permutations per signature
+            bands: Number of LSH bands; must divide num_perm
+            shingle_size: Words per shingle
+            seed: Seed for the MinHash permutations
+        """
+        if num_perm % bands:
+            raise ValueError("bands must divide num_perm")
+        self.index_path = index_path
+        self.window_seconds = window_seconds
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.shingle_size = shingle_size
+        self.duplicates = 0
+        self.near_duplicates = 0
+        self.new = 0
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, size=num_perm, dtype=np.uint64)
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._buckets: Dict[tuple, Set[str]] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def signature(self, normalized: str) -> np.ndarray:
+        """MinHash signature of a normalized insight's word shingles."""
+        words = normalized.split()
+        size = min(self.shingle_size, len(words)) or 1
+        shingles = {
+            " ".join(words[i : i + size]) for i in range(max(1, len(words) - size + 1))
+        }
+        hashes = np.fromiter(
+            (
+                int.from_bytes(
+                    hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little"
+                )
+                % _PRIME
+                for s in shingles
+            ),
+            dtype=np.uint64,
+            count=len(shingles),
+        )
+        # a * x + b stays below 2**63 since every term is below 2**31
+        permuted = (self._a[:, None] * hashes[None, :] + self._b[:, None]) % _PRIME
+        return permuted.min(axis=1)
+
+    def _band_keys(self, signature: np.ndarray) -> List[tuple]:
+        rows = self.num_perm // self.bands
+        return [
+            (band, *signature[band * rows : (band + 1) * rows].tolist())
+            for band in range(self.bands)
+        ]
+
+    def _add(self, key: str, entry: Dict[str, Any]) -> None:
+        self._entries[key] = entry
+        for band_key in self._band_keys(np.asarray(entry["signature"], np.uint64)):
+            self._buckets.setdefault(band_key, set()).add(key)
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        for band_key in self._band_keys(np.asarray(entry["signature"], np.uint64)):
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band_key]
+
+    def _load(self) -> None:
+        if not self.index_path:
+            return
+        try:
+            with open(self.index_path, "r") as f:
+                entries = json.load(f)
+        except (json.JSONDecodeError, FileNotFoundError, ValueError):
+            return
+        self._entries = {}
+        self._buckets = {}
+        for key, entry in entries.items():
+            if len(entry.get("signature", ())) == self.num_perm:
+                self._add(key, entry)
+
+    def _save(self) -> None:
+        if self.index_path:
+            atomic_write_json(self.index_path, self._entries)
+
+    def _expire(self, now: float) -> None:
+        expired = [
+            key
+            for key, entry in self._entries.items()
+            if now - entry["seen"] > self.window_seconds
+        ]
+        for key in expired:
+            self._remove(key)
+
+    def _near_duplicate(
+        self, signature: np.ndarray, numbers: List[str]
+    ) -> Optional[str]:
+        candidates = set()
+        for band_key in self._band_keys(signature):
+            candidates |= self._buckets.get(band_key, set())
+
+        for key in candidates:
+            entry = self._entries[key]
+            similarity = np.mean(np.asarray(entry["signature"], np.uint64) == signature)
+            # Same story with different figures is an update worth passing on
+            if similarity >= self.threshold and entry["numbers"] == numbers:
+                return key
+        return None
+
+    def filter_new(self, insights: List[str]) -> List[str]:
+        """
+        Return the insights that are new or materially changed, recording them.
+
+        Duplicates, including duplicates within insights, are dropped; they
+        leave the first-seen time of the entry they match as it is. The index is reloaded
+        first, so callers that serialize refreshes across processes see each
+        other's entries.
+
+        Args:
+            insights: Insight lines, e.g. from get_crypto_gaming_news
+
+        Returns:
+            List[str]: The insights to hand downstream, in their input order
+        """
+        with self._lock:
+            self._load()
+            now = time.time()
+            self._expire(now)
+
+            fresh = []
+            for insight in insights:
+                normalized = normalize(insight)
+                if not normalized:
+                    continue
+
+                key = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+                if key in self._entries:
+                    self.duplicates += 1
+                    continue
+
+                signature = self.signature(normalized)
+                numbers = sorted(set(_NUMBER.findall(normalized)))
+                match = self._near_duplicate(signature, numbers)
+                if match is not None:
+                    self.near_duplicates += 1
+                    continue
+
+                self._add(
+                    key,
+                    {
+                        "signature": signature.tolist(),
+                        "numbers": numbers,
+                        "seen": now,
+                    },
+                )
+                self.new += 1
+                fresh.append(insight)
+
+            self._save()
+            return fresh
+
+    def stats(self) -> Dict[str, Any]:
+        """New and duplicate counts since this index was created."""
+        with self._lock:
+            return {
+                "new": self.new,
+                "duplicates": self.duplicates,
+                "near_duplicates": self.near_duplicates,
+                "entries": len(self._entries),
+            }
@@ -0,0 +1,111 @@
+import os
+import json
+import fcntl
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Set, TypeVar
+
+T = TypeVar("T")
+
+# Lock paths with a background refresh running in this process
+_background_refreshes: Set[str] = set()
+_background_guard = threading.Lock()
+
+
+def atomic_write_json(path: str, data: Any) -> None:
+    """
+    Write JSON to a temp file in the same directory, then rename it into place.
+
+    Readers see either the previous file or the complete new one, never a
+    partially written file.
+    """
+    atomic_write_text(path, json.dumps(data))
+
+
+def atomic_write_text(path: str, text: str) -> None:
+    """Write text atomically, like atomic_write_json, e.g. a metrics file."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+@contextmanager
+def locked(lock_path: str) -> Iterator[None]:
+    """Hold an exclusive advisory lock on lock_path, blocking until it is free."""
+    os.makedirs(os.path.dirname(lock_path) or ".", exist_ok=True)
+    with open(lock_path, "a") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def run_single_flight(
+    lock_path: str,
+    should_refresh: Callable[[], bool],
+    refresh: Callable[[], T],
+    skip: Callable[[], T],
+) -> T:
+    """
+    Refresh at most once across processes sharing lock_path.
+
+    The first caller to find the state stale takes the lock and refreshes.
+    Concurrent callers block on the lock, then re-check the state and receive
+    the freshly written result through skip() instead of refreshing again.
+
+    Args:
+        lock_path: Path of the advisory lock file
+        should_refresh: Returns True when the persisted state is stale
+        refresh: Performs the refresh and persists its result
+        skip: Returns the result to use when no refresh is needed
+    """
+    if not should_refresh():
+        return skip()
+
+    with locked(lock_path):
+        if not should_refresh():
+            return skip()
+        return refresh()
+
+
+def refresh_in_background(
+    lock_path: str,
+    should_refresh: Callable[[], bool],
+    refresh: Callable[[], Any],
+) -> bool:
+    """
+    Run a single-flight refresh on a worker thread and return immediately.
+
+    At most one background refresh per lock_path runs in this process; other
+    processes are kept out by the advisory lock as in run_single_flight.
+
+    Returns:
+        bool: True if a refresh was started, False if one was already running
+    """
+    with _background_guard:
+        if lock_path in _background_refreshes:
+            return False
+        _background_refreshes.add(lock_path)
+
+    def run() -> None:
+        try:
+            run_single_flight(lock_path, should_refresh, refresh, lambda: None)
+        finally:
+            with _background_guard:
+                _background_refreshes.discard(lock_path)
+
+    # Not a daemon, so a one-shot CLI run finishes the refresh before exiting
+    threading.Thread(target=run, name=f"refresh:{lock_path}").start()
+    return True
@@ -0,0 +1,223 @@
+import os
+import json
+import time
+import random
+import threading
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from refresh_lock import atomic_write_json
+
+
+class RefreshScheduler:
+    """
+    Adaptive refresh intervals, one per data source.
+
+    Each source ("dune:<query_id>", "news", ...) is polled on its own
+    interval. A poll reports a fingerprint of what it fetched. When the
+    fingerprint changes, the gap since the previous change updates a smoothed
+    estimate of the source's cadence, and the interval is set to a fraction
+    of it. When it does not change, the interval grows geometrically. So a
+    weekly series drifts towards max_interval and a source that changes on
+    every poll towards min_interval. Failed polls back off exponentially.
+    Every delay is jittered so sources do not fire in lockstep. State is
+    persisted to a JSON file so one-shot runs share it.
+    """
+
+    def __init__(
+        self,
+        state_path: Optional[str] = None,
+        min_interval: float = 15 * 60,
+        max_interval: float = 24 * 60 * 60,
+        initial_interval: float = 30 * 60,
+        limits: Optional[Dict[str, Tuple[float, float]]] = None,
+        growth: float = 1.5,
+        poll_fraction: float = 0.5,
+        smoothing: float = 0.3,
+        jitter: float = 0.1,
+        backoff_base: float = 60,
+        backoff_max: float = 60 * 60,
+        seed: Optional[int] = None,
+    ):
+        """
+        Args:
+            state_path: JSON file to persist state to, or None for memory only
+            min_interval: Shortest interval between polls of a source, seconds
+            max_interval: Longest interval between polls of a source, seconds
+            initial_interval: Interval of a source until it has changed twice
+            limits: (min_interval, max_interval) overrides keyed by source
+            growth: Factor the interval grows by after an unchanged poll
+            poll_fraction: Fraction of the observed cadence to poll at
+            smoothing: Weight of the latest gap in the cadence estimate
+            jitter: Fraction every delay is randomly varied by
+            backoff_base: Delay after the first failed poll, in seconds
+            backoff_max: Longest delay after failed polls, in seconds
+            seed: Seed for the jitter draws
+        """
+        self.state_path = state_path
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.initial_interval = initial_interval
+        self.limits = limits or {}
+        self.growth = growth
+        self.poll_fraction = poll_fraction
+        self.smoothing = smoothing
+        self.jitter = jitter
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._sources: Dict[str, Dict[str, Any]] = {}
+        # Modification time of the state file as last loaded or saved
+        self._mtime: Optional[int] = None
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        if not self.state_path:
+            return
+        try:
+            with open(self.state_path, "r") as f:
+                mtime = os.fstat(f.fileno()).st_mtime_ns
+                self._sources = json.load(f)
+        except (json.JSONDecodeError, FileNotFoundError, ValueError):
+            return
+        self._mtime = mtime
+
+    def _reload(self) -> None:
+        """Load the state file again if another process has saved it since."""
+        if not self.state_path:
+            return
+        try:
+            mtime = os.stat(self.state_path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime != self._mtime:
+            self._load()
+
+    def _save(self) -> None:
+        if self.state_path:
+            atomic_write_json(self.state_path, self._sources)
+            self._mtime = os.stat(self.state_path).st_mtime_ns
+
+    def _is_due(self, source: str, now: float) -> bool:
+        state = self._sources.get(source)
+        return state is None or now >= state["next_due"]
+
+    def _clamp(self, source: str, interval: float) -> float:
+        low, high = self.limits.get(source, (self.min_interval, self.max_interval))
+        return min(max(interval, low), high)
+
+    def _jittered(self, delay: float) -> float:
+        return delay * self._rng.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def _state(self, source: str) -> Dict[str, Any]:
+        return self._sources.setdefault(
+            source,
+            {
+                "interval": self._clamp(source, self.initial_interval),
+                "next_due": 0.0,
+                "fingerprint": None,
+                "last_change": None,
+                "cadence": None,
+                "failures": 0,
+            },
+        )
+
+    def due(self, source: str, now: Optional[float] = None) -> bool:
+        """
+        Whether a source should be polled now. Unknown sources are due.
+
+        Polls recorded by other processes sharing the state file are seen,
+        so a re-check after taking a refresh lock is up to date.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            self._reload()
+            return self._is_due(source, now)
+
+    def any_due(
+        self, sources: Optional[Iterable[str]] = None, now: Optional[float] = None
+    ) -> bool:
+        """
+        Whether any of sources, by default every known source, is due.
+
+        True when no source is known yet. Like due, sees polls recorded by
+        other processes.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            self._reload()
+            sources = list(self._sources) if sources is None else list(sources)
+            return not sources or any(self._is_due(source, now) for source in sources)
+
+    def record_success(
+        self, source: str, fingerprint: str, now: Optional[float] = None
+    ) -> bool:
+        """
+        Record a successful poll and schedule the next one.
+
+        Args:
+            source: Source that was polled
+            fingerprint: Digest of the fetched data, compared with the last one
+            now: Time of the poll, by default the current time
+
+        Returns:
+            bool: True if the fingerprint changed since the previous poll
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            self._load()
+            state = self._state(source)
+            changed = fingerprint != state["fingerprint"]
+
+            if changed and state["last_change"] is not None:
+                gap = now - state["last_change"]
+                cadence = state["cadence"]
+                cadence = (
+                    gap
+                    if cadence is None
+                    else (1 - self.smoothing) * cadence + self.smoothing * gap
+                )
+                state["cadence"] = cadence
+                state["interval"] = self._clamp(source, cadence * self.poll_fraction)
+            elif not changed:
+                interval = state["interval"] * self.growth
+                # Don't wait longer than the source has been seen to change
+                if state["cadence"] is not None:
+                    interval = min(interval, state["cadence"])
+                state["interval"] = self._clamp(source, interval)
+
+            if changed:
+                state["fingerprint"] = fingerprint
+                state["last_change"] = now
+            state["failures"] = 0
+            state["next_due"] = now + self._jittered(state["interval"])
+            self._save()
+            return changed
+
+    def record_failure(self, source: str, now: Optional[float] = None) -> None:
+        """Record a failed poll, backing off exponentially before the next one."""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._load()
+            state = self._state(source)
+            state["failures"] += 1
+            delay = min(
+                self.backoff_max, self.backoff_base * 2 ** (state["failures"] - 1)
+            )
+            state["next_due"] = now + self._jittered(delay)
+            self._save()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Interval, cadence, failures and seconds until due, per source."""
+        now = time.time()
+        with self._lock:
+            self._reload()
+            return {
+                source: {
+                    "interval": state["interval"],
+                    "cadence": state["cadence"],
+                    "failures": state["failures"],
+                    "due_in": max(0.0, state["next_due"] - now),
+                }
+                for source, state in self._sources.items()
+            }
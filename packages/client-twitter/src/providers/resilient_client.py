@@ -0,0 +1,284 @@
+import time
+import random
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+import instrumentation
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling an endpoint whose circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Stops calling an endpoint after repeated failures.
+
+    After failure_threshold consecutive failures the breaker opens and calls
+    fail fast. Once reset_timeout has passed, one probe call is let through
+    (half open): success closes the breaker, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60.0):
+        """
+        Args:
+            failure_threshold: Consecutive failures that open the breaker
+            reset_timeout: Seconds the breaker stays open before a probe
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """"closed", "open" or "half_open"."""
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return "open"
+            return "half_open"
+
+    def allow(self) -> bool:
+        """Whether a call may go out now; claims the probe when half open."""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+
+class Upstream:
+    """
+    Retries, hedging and per-endpoint circuit breakers for one upstream service.
+
+    Failed calls are retried with jittered exponential backoff. Hedged calls
+    send a second identical request when the first has not answered within
+    hedge_after seconds and return whichever succeeds first, trimming tail
+    latency of idempotent reads. Each endpoint has its own breaker, so one
+    failing query does not cut off the others.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        retries: int = 2,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        jitter: float = 0.5,
+        hedge_after: Optional[float] = None,
+        failure_threshold: int = 5,
+        reset_timeout: float = 60.0,
+        max_workers: int = 16,
+    ):
+        """
+        Args:
+            name: Upstream name, exported as a metric label
+            retries: Retries after a failed call
+            backoff_base: Delay before the first retry, doubled after each
+            backoff_max: Longest delay between retries
+            jitter: Fraction of each delay that is randomized
+            hedge_after: Seconds before a hedged call sends its second
+                request, or None to never hedge
+            failure_threshold: Consecutive failures that open an endpoint's
+                breaker
+            reset_timeout: Seconds an open breaker waits before a probe
+            max_workers: Threads available to hedged requests
+        """
+        self.name = name
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.jitter = jitter
+        self.hedge_after = hedge_after
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_workers = max_workers
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._rng = random.Random()
+
+    def breaker(self, endpoint: str) -> CircuitBreaker:
+        """The circuit breaker of an endpoint, created on first use."""
+        with self._lock:
+            if endpoint not in self._breakers:
+                self._breakers[endpoint] = CircuitBreaker(
+                    self.failure_threshold, self.reset_timeout
+                )
+            return self._breakers[endpoint]
+
+    def breaker_states(self) -> Dict[str, str]:
+        """State of every endpoint's breaker."""
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {endpoint: breaker.state for endpoint, breaker in breakers.items()}
+
+    def _count(self, endpoint: str, outcome: str) -> None:
+        instrumentation.inc(
+            "analytics_upstream_calls_total",
+            upstream=self.name,
+            endpoint=endpoint.split(":")[0],
+            outcome=outcome,
+        )
+
+    def _backoff(self, attempt: int, backoff_base: float) -> float:
+        delay = min(self.backoff_max, backoff_base * 2**attempt)
+        return delay * (1 - self.jitter * self._rng.random())
+
+    def _hedged(self, endpoint: str, fn: Callable[[], T]) -> T:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix=f"{self.name}-hedge"
+                )
+            executor = self._executor
+
+        futures = {executor.submit(fn)}
+        done, _ = wait(futures, timeout=self.hedge_after)
+        if not done:
+            self._count(endpoint, "hedged")
+            futures.add(executor.submit(fn))
+
+        # First success wins; the slower request is left to finish on its own
+        error: Optional[BaseException] = None
+        while futures:
+            done, futures = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def call(
+        self,
+        endpoint: str,
+        fn: Callable[..., T],
+        *args: Any,
+        hedge: bool = False,
+        retries: Optional[int] = None,
+        backoff_base: Optional[float] = None,
+        **kwargs: Any,
+    ) -> T:
+        """
+        Call fn(*args, **kwargs) through the endpoint's breaker with retries.
+
+        Args:
+            endpoint: Breaker key, e.g. "get_latest_result:4262272"
+            fn: The client call
+            hedge: Hedge the call; only for idempotent reads
+            retries: Overrides the upstream's retries for this call
+            backoff_base: Overrides the upstream's backoff_base for this call
+
+        Raises:
+            CircuitOpenError: If the endpoint's breaker is open
+        """
+        retries = self.retries if retries is None else retries
+        backoff_base = self.backoff_base if backoff_base is None else backoff_base
+        breaker = self.breaker(endpoint)
+
+        for attempt in range(retries + 1):
+            if not breaker.allow():
+                self._count(endpoint, "open")
+                raise CircuitOpenError(f"{self.name} {endpoint} circuit is open")
+            try:
+                if hedge and self.hedge_after is not None:
+                    result = self._hedged(endpoint, lambda: fn(*args, **kwargs))
+                else:
+                    result = fn(*args, **kwargs)
+            except Exception:
+                breaker.record_failure()
+                if attempt == retries:
+                    self._count(endpoint, "error")
+                    raise
+                self._count(endpoint, "retry")
+                time.sleep(self._backoff(attempt, backoff_base))
+            else:
+                breaker.record_success()
+                self._count(endpoint, "ok")
+                return result
+
+
+class ResilientDuneClient:
+    """
+    DuneClient wrapper routing its reads through an Upstream.
+
+    Result reads are retried, and hedged only when the Upstream is given a
+    hedge_after, since a hedge repeats a whole result download. Each query
+    has its own breaker, and the wrapped client's pooled HTTP session is
+    sized for concurrent fetches with its own retries turned off so the
+    Upstream is the only retry layer.
+    Other attributes are passed through to the wrapped client.
+    """
+
+    def __init__(
+        self, dune_client, upstream: Optional[Upstream] = None, pool_size: int = 16
+    ):
+        """
+        Args:
+            dune_client: DuneClient instance, or any client with the same reads
+            upstream: Retry, hedging and breaker policy; by default
+                retrying without hedging
+            pool_size: Connections kept open to the Dune API
+        """
+        self.dune = dune_client
+        self.upstream = upstream or Upstream("dune")
+
+        http = getattr(dune_client, "http", None)
+        if http is not None and hasattr(http, "mount"):
+            from requests.adapters import HTTPAdapter
+
+            adapter = HTTPAdapter(
+                pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0
+            )
+            http.mount("https://", adapter)
+            http.mount("http://", adapter)
+
+    def get_latest_result(self, query_id: int, **kwargs):
+        return self.upstream.call(
+            f"get_latest_result:{query_id}",
+            self.dune.get_latest_result,
+            query_id,
+            hedge=True,
+            **kwargs,
+        )
+
+    def download_csv(self, query_id: int, **kwargs):
+        return self.upstream.call(
+            f"download_csv:{query_id}",
+            self.dune.download_csv,
+            query_id,
+            hedge=True,
+            **kwargs,
+        )
+
+    def _get(self, route: str, params: Optional[Dict[str, Any]] = None):
+        return self.upstream.call(
+            f"get:{route}", self.dune._get, route=route, params=params, hedge=True
+        )
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.dune, name)
@@ -1,8 +1,5 @@
 import { IAgentRuntime, Memory, Provider, State } from "@ai16z/eliza";
-import { spawn } from 'child_process';
-import { join } from 'path';
-import { fileURLToPath } from 'url';
-import { dirname } from 'path';
+import { callAnalyticsService } from './analyticsService.ts';
 
 // Cache to store the latest analytics results
 let analyticsCache = {
@@ -10,45 +7,22 @@ let analyticsCache = {
     lastUpdated: 0
 };
 
-// Update interval in milliseconds (30 minutes)
-const UPDATE_INTERVAL = 30 * 60 * 1000;
+// Poll interval in milliseconds (5 minutes); the analytics service decides
+// per source whether a poll triggers a refresh or serves cached insights
+const UPDATE_INTERVAL = 5 * 60 * 1000;
 
 async function executeAnalytics(): Promise<string> {
-    return new Promise((resolve, reject) => {
-        const __filename = fileURLToPath(import.meta.url);
-        const __dirname = dirname(__filename);
-        const pythonScript = join(__dirname, '..', '..', '..', 'packages', 'client-twitter', 'src', 'providers', 'ronin_analytics.py');
-        
-        console.log('Python script path:', pythonScript);
-
-        const python = spawn('python3', [
-            pythonScript
-        ]);
-        
-        let output = '';
-        let error = '';
-
-        python.stdout.on('data', (data) => {
-            output += data.toString();
-        });
-
-        python.stderr.on('data', (data) => {
-            error += data.toString();
-        });
-
-        python.on('close', (code) => {
-            if (code !== 0) {
-                reject(new Error(`Python script exited with code ${code}\nError: ${error}`));
-                return;
-            }
-            resolve(output);
-        });
-    });
+    const insights = await callAnalyticsService<string[]>('ronin_insights');
+    return insights.join('\n');
 }
 
 async function updateAnalytics() {
     try {
         const result = await executeAnalytics();
+        // Keep the last good analytics if the service had nothing to serve
+        if (!result) {
+            return;
+        }
         analyticsCache.data = result;
         analyticsCache.lastUpdated = Date.now();
     } catch (error) {
@@ -1,216 +1,857 @@
+from __future__ import annotations
+
+import io
 import os
+import sys
 import json
-import pandas as pd
-from typing import List, Dict, Any
+import hashlib
+import argparse
+from typing import (
+    TYPE_CHECKING,
+    List,
+    Dict,
+    Any,
+    Iterable,
+    Iterator,
+    Optional,
+    Tuple,
+    Union,
+)
 
 
 import time
-import pytz
+import threading
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
+from dataclasses import replace
 from datetime import datetime, timedelta
-
-from dune_client.client import DuneClient
-
-import google.generativeai as genai
-from google.generativeai.types import content_types
+from functools import lru_cache
 
 from pathlib import Path
 
 from dotenv import load_dotenv
 
+from dune_cache import DuneResultCache
+from game_history import GameHistory, rank_games, top_games
+from metric_records import MetricRecord, SectionRouter
+from metric_specs import DerivedSpec, MetricSpec, load_derived_specs, load_metric_specs
+from metric_stats import MetricStats, MetricStatsEngine, describe_anomaly
+from llm_cache import LLMResponseCache
+from insight_store import InsightStore
+import instrumentation
+from lazy_imports import LazyModule, LazyObject
+from ndjson_records import make_record, write_records
+from refresh_lock import atomic_write_json, refresh_in_background, run_single_flight
+from refresh_scheduler import RefreshScheduler
+from resilient_client import ResilientDuneClient, Upstream
+
+if TYPE_CHECKING:
+    from dune_client.client import DuneClient
+    from dune_columns import Columns
+    from metric_changes import Series
+    from metric_store import MetricStore
+
 load_dotenv()
 
 # Get API keys from environment
-DUNE_API_KEY = os.environ["DUNE_API_KEY"]
-GOOGLE_API_KEY = os.environ["GOOGLE_GENERATIVE_AI_API_KEY"]
+DUNE_API_KEY = os.environ.get("DUNE_API_KEY")
+GOOGLE_API_KEY = os.environ.get("GOOGLE_GENERATIVE_AI_API_KEY")
+
+# numpy and the Gemini SDK are only imported once a refresh needs them, so
+# serving cached insights stays fast. The SDK is configured on import.
+np = LazyModule("numpy")
+genai = LazyModule(
+    "google.generativeai", on_load=lambda sdk: sdk.configure(api_key=GOOGLE_API_KEY)
+)
+
+SYNTHESIS_MODEL = "gemini-1.5-pro-latest"
+
+# Retries and circuit breaker shared by every synthesis request
+GEMINI_UPSTREAM = Upstream("gemini", backoff_base=2.0)
+
+# Directory holding lockfiles and on-disk caches
+STATE_DIR = Path(os.environ.get("ANALYTICS_STATE_DIR") or Path(__file__).parent)
+
+# Dune queries backing the knowledge base
+RON_PRICE_QUERY_ID = 4262272
+RON_PRICE_HISTORY_QUERY_ID = 4228181
+WAA_QUERY_ID = 4228167
+DAILY_ADDRESSES_QUERY_ID = 4264865
+GAME_ACTIVITY_QUERY_ID = 4358228
+TVL_QUERY_ID = 4228179
+FEES_QUERY_ID = 4228192
+TRANSACTIONS_QUERY_ID = 4228170
+
+KNOWLEDGE_BASE_QUERY_IDS = [
+    RON_PRICE_QUERY_ID,
+    RON_PRICE_HISTORY_QUERY_ID,
+    WAA_QUERY_ID,
+    DAILY_ADDRESSES_QUERY_ID,
+    GAME_ACTIVITY_QUERY_ID,
+    TVL_QUERY_ID,
+    FEES_QUERY_ID,
+    TRANSACTIONS_QUERY_ID,
+]
+
+# Analyzers for data that is not a plain metric series, with their query.
+# Time-series metrics are declared in metric_specs.json instead.
+KNOWLEDGE_BASE_ANALYZERS = [
+    ("get_ron_price", RON_PRICE_QUERY_ID),
+    ("analyze_game_activity", GAME_ACTIVITY_QUERY_ID),
+    ("analyze_cumulative_stats", TRANSACTIONS_QUERY_ID),
+]
+
+# Section of each analyzer's metric lines, keyed by their label
+ANALYZER_SECTIONS = {
+    "Current RON Price": "Market",
+    "Cumulative Stats": "Economics",
+    "Other Games": "Games",
+}
+
+# Per-game lines are labelled with the game, so they are routed on their shape
+GAME_LINE_PATTERN = r"[^:|]+: DAU "
+
+# Synthesis sections in output order, with the context given for each
+SYNTHESIS_SECTIONS = ["Market", "Games", "Users", "Economics"]
+SECTION_CONTEXT = {
+    "Market": "Price performance and market dynamics",
+    "Games": "Game-specific performance metrics",
+    "Users": "Network-wide user activity",
+    "Economics": "Economic indicators and network usage",
+}
+
+# Section label used for the single structured synthesis request
+STRUCTURED_SECTION = "all"
+
+
+def insights_schema(sections: List[str]) -> Dict[str, Any]:
+    """
+    JSON schema constraining a structured synthesis response.
+
+    Args:
+        sections: Sections an insight may be attributed to
+    """
+    return {
+        "type": "object",
+        "properties": {
+            "insights": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "section": {"type": "string", "enum": list(sections)},
+                        "insight": {"type": "string"},
+                    },
+                    "required": ["section", "insight"],
+                },
+            }
+        },
+        "required": ["insights"],
+    }
 
 
-class RoninAnalytics:
-    def __init__(self, dune_client):
-        self.dune = dune_client
+def section_router(
+    specs: List[MetricSpec], derived_specs: Iterable[DerivedSpec] = ()
+) -> SectionRouter:
+    """Router sending metric lines of the specs and analyzers to their sections."""
+    labels = {spec.name: spec.section for spec in specs}
+    labels.update({spec.name: spec.section for spec in derived_specs})
+    labels.update(ANALYZER_SECTIONS)
+    return SectionRouter(labels, [(GAME_LINE_PATTERN, "Games")])
 
-    def calculate_changes(
+
+@lru_cache(maxsize=None)
+def default_section_router() -> SectionRouter:
+    """section_router of the shipped metric and derived specs, built once."""
+    return section_router(load_metric_specs(), load_derived_specs())
+
+
+def dune_source(query_id: int) -> str:
+    """Refresh scheduler source name of a Dune query."""
+    return f"dune:{query_id}"
+
+
+def fingerprint(result: Any) -> str:
+    """Digest of fetched rows or typed columns, to tell whether they changed."""
+    digest = hashlib.sha256()
+    if isinstance(result, dict):
+        for name in sorted(result):
+            digest.update(name.encode("utf-8"))
+            digest.update(np.ascontiguousarray(result[name]).tobytes())
+    else:
+        digest.update(json.dumps(result, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class RoninAnalytics:
+    def __init__(
         self,
-        df: pd.DataFrame,
-        value_column: str,
-        date_column: str,
-        lookback_periods: List[tuple],
-    ) -> Dict[str, float]:
+        dune_client,
+        max_workers: int = 8,
+        fetch_timeout: float = 120.0,
+        result_cache: Optional[DuneResultCache] = None,
+        metric_store: Optional[MetricStore] = None,
+        metric_specs: Optional[List[MetricSpec]] = None,
+        derived_specs: Optional[List[DerivedSpec]] = None,
+        scheduler: Optional[RefreshScheduler] = None,
+        metric_stats: Optional[MetricStatsEngine] = None,
+        game_history: Optional[GameHistory] = None,
+        game_top_k: int = 5,
+    ):
         """
-        Calculate changes over specified time periods.
-        lookback_periods: List of tuples (number_of_days, period_label)
+        Args:
+            dune_client: DuneClient instance
+            max_workers: Maximum number of concurrent Dune requests
+            fetch_timeout: Seconds to wait for each query result
+            result_cache: Optional on-disk cache that query results go through
+            metric_store: Optional local history that lookbacks are read from
+            metric_specs: Time-series metrics to report, by default the ones
+                in metric_specs.json
+            derived_specs: Indicators derived from the metric specs, by
+                default the ones in derived_metrics.json
+            scheduler: Optional per-query refresh schedule; queries that are
+                not due are served from the previous fetch
+            metric_stats: Optional rolling statistics engine flagging
+                anomalous observations of the metric specs
+            game_history: Optional per-game history that rank movements and
+                growth acceleration are computed from
+            game_top_k: Games reported per ranking criterion; the rest are
+                summed into one line
         """
-        df = df.copy()
-        df[date_column] = pd.to_datetime(df[date_column])
-        df = df.sort_values(date_column, ascending=False)
+        self.dune = dune_client
+        self.metric_specs = (
+            load_metric_specs() if metric_specs is None else metric_specs
+        )
+        self.derived_specs = (
+            load_derived_specs() if derived_specs is None else derived_specs
+        )
+        # Routes formatted lines of these specs and the analyzers to sections
+        self.section_router = section_router(self.metric_specs, self.derived_specs)
+        self.result_cache = result_cache
+        self.metric_store = metric_store
+        self.metric_stats = metric_stats
+        self.game_history = game_history
+        self.game_top_k = game_top_k
+        self.max_workers = max_workers
+        self.fetch_timeout = fetch_timeout
+        self.scheduler = scheduler
+        self._rows: Dict[int, List[Dict[str, Any]]] = {}
+        self._columns: Dict[int, Columns] = {}
+        self._fetch_errors: Dict[int, Exception] = {}
+
+    def prefetch(self, query_ids: List[int]) -> Dict[int, Exception]:
+        """
+        Fetch the latest result rows for all queries concurrently.
 
-        current_value = float(df.iloc[0][value_column])
-        result = {"current": current_value}
+        Args:
+            query_ids: Dune query IDs to fetch
 
-        for days, label in lookback_periods:
-            try:
-                lookup_date = df.iloc[0][date_column] - timedelta(days=days)
-                past_value = float(
-                    df[df[date_column] <= lookup_date].iloc[0][value_column]
-                )
-                change = ((current_value - past_value) / past_value) * 100
-                result[label] = change
-            except (IndexError, ValueError):
-                result[label] = None
+        Returns:
+            Dict[int, Exception]: Errors for queries that failed or timed out
+        """
+        for _ in self.iter_prefetch(query_ids):
+            pass
+        return dict(self._fetch_errors)
 
-        return result
+    def iter_prefetch(self, query_ids: List[int]) -> Iterator[int]:
+        """
+        Fetch queries concurrently, yielding each query ID as soon as its rows
+        or its error are available.
+
+        With a scheduler, queries that are not due and were fetched before are
+        yielded first without a request, and each fetch is reported back to
+        the scheduler.
+
+        Each query times out fetch_timeout seconds after its own fetch
+        started, so queries waiting for a free worker get their full timeout,
+        whatever time the consumer spends between yields; a query that
+        finished meanwhile is never counted as timed out. A query that cannot
+        get a worker within fetch_timeout per wave of max_workers queries
+        fails too, so a hung request cannot hold up the ones behind it.
+        """
+        held_rows, held_columns = self._rows, self._columns
+        self._rows = {}
+        self._columns = {}
+        self._fetch_errors = {}
+
+        if self.scheduler is not None:
+            fetch_ids = []
+            for query_id in query_ids:
+                if self.scheduler.due(dune_source(query_id)):
+                    fetch_ids.append(query_id)
+                elif query_id in held_rows:
+                    self._rows[query_id] = held_rows[query_id]
+                elif query_id in held_columns:
+                    self._columns[query_id] = held_columns[query_id]
+                else:
+                    fetch_ids.append(query_id)
+            for query_id in query_ids:
+                if query_id in self._rows or query_id in self._columns:
+                    yield query_id
+            query_ids = fetch_ids
+
+        if not query_ids:
+            return
+
+        columnar = self._columnar_query_ids()
+
+        workers = max(1, min(self.max_workers, len(query_ids)))
+        executor = ThreadPoolExecutor(max_workers=workers)
+        started: Dict[int, float] = {}
+
+        def fetch(query_id: int) -> Any:
+            started[query_id] = time.monotonic()
+            if query_id in columnar:
+                return self._fetch_columns(query_id)
+            return self._fetch_rows(query_id)
 
-    def format_metric_string(
+        try:
+            futures = {
+                executor.submit(fetch, query_id): query_id for query_id in query_ids
+            }
+            waves = -(-len(query_ids) // workers)
+            queue_deadline = time.monotonic() + self.fetch_timeout * waves
+
+            def deadline(future: Any) -> float:
+                start = started.get(futures[future])
+                return queue_deadline if start is None else start + self.fetch_timeout
+
+            pending = set(futures)
+            while pending:
+                next_deadline = min(deadline(future) for future in pending)
+                done, pending = wait(
+                    pending,
+                    timeout=max(0.0, next_deadline - time.monotonic()),
+                    return_when=FIRST_COMPLETED,
+                )
+                for future in done:
+                    query_id = futures[future]
+                    try:
+                        result = future.result()
+                        if query_id in columnar:
+                            self._columns[query_id] = result
+                        else:
+                            self._rows[query_id] = result
+                        self._schedule(query_id, result)
+                    except Exception as e:
+                        self._schedule(query_id, None)
+                        self._fetch_failed(query_id, e, held_rows, held_columns)
+                    yield query_id
+
+                # Time out what is still running past its own deadline;
+                # anything that finished meanwhile is collected by the next wait
+                now = time.monotonic()
+                expired = [
+                    future
+                    for future in pending
+                    if not future.done() and deadline(future) <= now
+                ]
+                pending -= set(expired)
+                for future in expired:
+                    query_id = futures[future]
+                    future.cancel()
+                    if query_id in started:
+                        message = (
+                            f"query {query_id} timed out after {self.fetch_timeout}s"
+                        )
+                    else:
+                        message = f"query {query_id} never got a free worker"
+                    self._schedule(query_id, None)
+                    self._fetch_failed(
+                        query_id, TimeoutError(message), held_rows, held_columns
+                    )
+                    yield query_id
+        finally:
+            # Don't let a hung request hold up the knowledge base
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _fetch_failed(
         self,
-        metric_name: str,
-        current: float,
-        changes: Dict[str, float],
-        include_value: bool = True,
-    ) -> str:
-        """Format metric with its changes into a human readable string."""
-        parts = [f"{metric_name}: {current:,.0f}"] if include_value else [metric_name]
-
-        for period, change in changes.items():
-            if period != "current" and change is not None:
-                direction = "up" if change > 0 else "down"
-                parts.append(f"{period} change: {abs(change):.1f}% {direction}")
-
-        return " | ".join(parts)
-
-    def analyze_waa(self) -> List[str]:
-        """Weekly Active Addresses."""
-        data = pd.DataFrame(self.dune.get_latest_result(4228167).result.rows)
-        lookback_periods = [(7, "1w"), (30, "1m"), (90, "3m"), (180, "6m"), (365, "1y")]
-        changes = self.calculate_changes(
-            data, "users_moving_average", "time", lookback_periods
+        query_id: int,
+        error: Exception,
+        held_rows: Dict[int, List[Dict[str, Any]]],
+        held_columns: Dict[int, Columns],
+    ) -> None:
+        """Fall back to the previous fetch of a query, or record its error."""
+        if query_id in held_rows:
+            self._rows[query_id] = held_rows[query_id]
+        elif query_id in held_columns:
+            self._columns[query_id] = held_columns[query_id]
+        else:
+            self._fetch_errors[query_id] = error
+            print(f"Error fetching Dune query {query_id}: {str(error)}")
+            return
+        print(
+            f"Error fetching Dune query {query_id}, serving previous result: {str(error)}"
         )
 
-        return [
-            self.format_metric_string(
-                "Weekly Active Users",
-                changes["current"],
-                {k: v for k, v in changes.items() if k != "current"},
+    def _schedule(self, query_id: int, result: Any) -> None:
+        """Report a fetch, or a failed one if result is None, to the scheduler."""
+        if self.scheduler is None:
+            return
+        if result is None:
+            self.scheduler.record_failure(dune_source(query_id))
+        else:
+            self.scheduler.record_success(dune_source(query_id), fingerprint(result))
+
+    def _fetch_rows(self, query_id: int) -> List[Dict[str, Any]]:
+        with instrumentation.span("dune_fetch", query_id=query_id) as fields:
+            if self.result_cache is not None:
+                rows = self.result_cache.get_rows(query_id)
+            else:
+                rows = self.dune.get_latest_result(query_id).result.rows
+            fields["rows"] = len(rows)
+
+        instrumentation.inc("analytics_dune_rows_total", len(rows), query_id=query_id)
+        return rows
+
+    def get_rows(self, query_id: int) -> List[Dict[str, Any]]:
+        """Return prefetched rows for a query, fetching them if needed."""
+        if query_id in self._rows:
+            return self._rows[query_id]
+        if query_id in self._fetch_errors:
+            raise self._fetch_errors[query_id]
+        return self._fetch_rows(query_id)
+
+    def _spec_columns(self, query_id: int) -> Tuple[List[str], List[str]]:
+        """Date and value columns the metric specs read from a query."""
+        specs = [spec for spec in self.metric_specs if spec.query_id == query_id]
+        date_columns = sorted({spec.date_column for spec in specs})
+        value_columns = sorted({spec.value_column for spec in specs})
+        return date_columns, value_columns
+
+    def _columnar_query_ids(self) -> set:
+        """
+        Queries that can be fetched as projected CSV columns.
+
+        That is every query read only by metric specs, as long as the client
+        supports CSV results; a result cache keeps the projected CSV, keyed
+        by its columns and filter. Queries an analyzer reads still come back
+        as full rows.
+        """
+        if not hasattr(self.dune, "download_csv"):
+            return set()
+        analyzer_queries = {query_id for _, query_id in KNOWLEDGE_BASE_ANALYZERS}
+        return {
+            spec.query_id
+            for spec in self.metric_specs
+            if spec.query_id not in analyzer_queries
+        }
+
+    def _row_filter(self, query_id: int) -> Optional[str]:
+        """
+        Dune filter limiting a query to the rows its metric specs still need.
+
+        With a metric store, that is everything from the latest stored date on,
+        once every spec on the query has history. Without one, it is the
+        longest lookback of the specs and of the derived indicators reading
+        them, or the metric_stats window counted in weeks if longer, plus a
+        month of slack.
+        """
+        specs = [spec for spec in self.metric_specs if spec.query_id == query_id]
+        date_columns = {spec.date_column for spec in specs}
+        if len(date_columns) != 1:
+            return None
+
+        if self.metric_store is not None:
+            stored = [self.metric_store.load(spec.key)[0] for spec in specs]
+            if not all(len(dates) for dates in stored):
+                return None
+            cutoff = min(dates[-1] for dates in stored)
+        else:
+            keys = {spec.key for spec in specs}
+            readers = [
+                derived
+                for derived in self.derived_specs
+                if derived.numerator in keys or derived.denominator in keys
+            ]
+            days = max(
+                days for spec in specs + readers for days, _ in spec.lookbacks
             )
-        ]
+            if self.metric_stats is not None:
+                # Series may be weekly, so a window of weeks covers either grid
+                days = max(days, self.metric_stats.window * 7)
+            cutoff = np.datetime64(datetime.now()) - np.timedelta64(days + 31, "D")
+
+        return f"{date_columns.pop()} >= '{np.datetime_as_string(cutoff, unit='D')}'"
+
+    def _fetch_columns(self, query_id: int) -> Columns:
+        date_columns, value_columns = self._spec_columns(query_id)
+        with instrumentation.span("dune_fetch", query_id=query_id) as fields:
+            projection = date_columns + value_columns
+            filters = self._row_filter(query_id)
+            if self.result_cache is not None:
+                data = io.StringIO(
+                    self.result_cache.get_csv(query_id, projection, filters)
+                )
+            else:
+                data = self.dune.download_csv(
+                    query_id, columns=projection, filters=filters
+                ).data
+            from dune_columns import columns_from_csv
+
+            columns = columns_from_csv(data, date_columns, value_columns)
+            rows = len(columns[date_columns[0]]) if date_columns else 0
+            fields["rows"] = rows
+
+        instrumentation.inc("analytics_dune_rows_total", rows, query_id=query_id)
+        return columns
+
+    def get_columns(self, query_id: int) -> Columns:
+        """Return the typed columns the metric specs read from a query."""
+        if query_id in self._columns:
+            return self._columns[query_id]
+        from dune_columns import columns_from_rows
+
+        rows = self.get_rows(query_id)
+        with instrumentation.span("columns", query_id=query_id) as fields:
+            fields["rows"] = len(rows)
+            return columns_from_rows(rows, *self._spec_columns(query_id))
+
+    @property
+    def query_ids(self) -> List[int]:
+        """Every query the knowledge base needs, in output order."""
+        query_ids = list(KNOWLEDGE_BASE_QUERY_IDS)
+        for spec in self.metric_specs:
+            if spec.query_id not in query_ids:
+                query_ids.append(spec.query_id)
+        return query_ids
+
+    def analyze_metrics(self, specs: List[MetricSpec]) -> Dict[str, MetricRecord]:
+        """
+        Calculate the changes of every spec in one vectorized pass.
+
+        A spec whose query failed or whose columns are missing only drops its
+        own metric line, and the derived indicators that need it. Derived
+        indicators are computed from the specs' series aligned into one
+        frame per frequency. With a metric_stats engine, each series also gets
+        its rolling statistics, updated with the observations added since
+        the previous run.
+
+        Returns:
+            Dict[str, MetricRecord]: Metric keyed by spec or derived spec key
+        """
+        from dune_columns import series_from_columns
+        from metric_changes import compute_changes_batch
+        from metric_frame import compute_derived
+
+        columns: Dict[int, Columns] = {}
+        series: Dict[str, Series] = {}
+        for spec in specs:
+            try:
+                if spec.query_id not in columns:
+                    columns[spec.query_id] = self.get_columns(spec.query_id)
+                dates, values = series_from_columns(
+                    columns[spec.query_id], spec.value_column, spec.date_column
+                )
+                if self.metric_store is not None:
+                    self.metric_store.merge(spec.key, dates, values)
+                    dates, values = self.metric_store.load(spec.key)
+                if not len(dates):
+                    raise IndexError(f"no rows for query {spec.query_id}")
+                series[spec.key] = (dates, values)
+            except Exception as e:
+                print(f"Error preparing metric {spec.key}: {str(e)}")
+
+        stats: Dict[str, Optional[MetricStats]] = {}
+        if self.metric_stats is not None:
+            try:
+                stats = self.metric_stats.update_many(series)
+            except Exception as e:
+                print(f"Error updating metric statistics: {str(e)}")
+
+        # One batched calculation per distinct set of horizons
+        groups: Dict[tuple, Dict[str, Series]] = {}
+        for spec in specs:
+            if spec.key in series:
+                groups.setdefault(spec.lookbacks, {})[spec.key] = series[spec.key]
+        changes: Dict[str, Dict[str, Optional[float]]] = {}
+        for lookbacks, group in groups.items():
+            changes.update(compute_changes_batch(group, list(lookbacks)))
+
+        derived: Dict[str, Dict[str, Optional[float]]] = {}
+        try:
+            derived = compute_derived(series, self.derived_specs)
+        except Exception as e:
+            print(f"Error computing derived indicators: {str(e)}")
+
+        metrics = {
+            spec.key: MetricRecord(
+                spec.name,
+                spec.section,
+                changes[spec.key]["current"],
+                {k: v for k, v in changes[spec.key].items() if k != "current"},
+                spec.query_id,
+                stats=stats.get(spec.key),
+            )
+            for spec in specs
+            if spec.key in changes
+        }
+        for spec in self.derived_specs:
+            if spec.key in derived:
+                metrics[spec.key] = MetricRecord(
+                    spec.name,
+                    spec.section,
+                    derived[spec.key]["current"],
+                    {k: v for k, v in derived[spec.key].items() if k != "current"},
+                    style="ratio",
+                )
+        return metrics
 
-    def analyze_game_activity(self) -> List[str]:
-        """Game Activity"""
+    def analyze_game_activity(self) -> List[MetricRecord]:
+        """
+        Game Activity of the top games by size, growth and acceleration.
+
+        Only the game_top_k games of each criterion get a line, each with its
+        DAU rank movement and, given a game history, its growth acceleration;
+        the remaining games are summed into one "Other Games" line, so the
+        Games section stays the same size however many games are listed.
+        """
         results = []
-        games = self.dune.get_latest_result(4358228).result.rows
+        games = self.get_rows(GAME_ACTIVITY_QUERY_ID)
 
-        for game in sorted(games, key=lambda x: x["num_of_accounts_1d"], reverse=True):
+        trends = None
+        if self.game_history is not None:
+            try:
+                trends = self.game_history.record(games)
+            except Exception as e:
+                print(f"Error updating game history: {str(e)}")
+        if trends is None:
+            trends = rank_games(games)
+        picks = top_games(games, trends, self.game_top_k)
+
+        by_project = {game["project"]: game for game in games}
+        for project, criteria in picks.items():
+            game = by_project[project]
             results.append(
-                f"{game['project']}: "
-                f"DAU {game['num_of_accounts_1d']:,.0f} ({game['diff_1d']*100:+.1f}% 1d) | "
-                f"WAU {game['num_of_accounts_7d']:,.0f} ({game['diff_7d']*100:+.1f}% 7d) | "
-                f"MAU {game['num_of_accounts_30d']:,.0f} ({game['diff_30d']*100:+.1f}% 30d)"
+                MetricRecord(
+                    game["project"],
+                    "Games",
+                    game["num_of_accounts_1d"],
+                    {
+                        period: None if diff is None else diff * 100
+                        for period, diff in (
+                            ("1d", game.get("diff_1d")),
+                            ("7d", game.get("diff_7d")),
+                            ("30d", game.get("diff_30d")),
+                        )
+                    },
+                    GAME_ACTIVITY_QUERY_ID,
+                    style="activity",
+                    counts=(
+                        ("DAU", game["num_of_accounts_1d"]),
+                        ("WAU", game["num_of_accounts_7d"]),
+                        ("MAU", game["num_of_accounts_30d"]),
+                    ),
+                    trend=replace(trends[project], criteria=criteria),
+                )
             )
 
-        return results
+        others = [game for game in games if game["project"] not in picks]
+        if others:
+            combined = sum(game["num_of_accounts_1d"] or 0 for game in others)
+            results.append(
+                MetricRecord(
+                    "Other Games",
+                    ANALYZER_SECTIONS["Other Games"],
+                    combined,
+                    query_id=GAME_ACTIVITY_QUERY_ID,
+                    style="totals",
+                    counts=(("more games", len(others)), ("combined DAU", combined)),
+                )
+            )
 
-    def analyze_daily_addresses(self) -> List[str]:
-        """Daily Active Addresses."""
-        data = pd.DataFrame(self.dune.get_latest_result(4264865).result.rows)
-        lookback_periods = [(1, "1d"), (7, "7d"), (30, "30d"), (90, "90d"), (365, "1y")]
-        changes = self.calculate_changes(
-            data, "receiving_addresses", "day", lookback_periods
-        )
+        return results
 
+    def analyze_cumulative_stats(self) -> List[MetricRecord]:
+        """Cumulative transactions and addresses."""
+        latest = self.get_rows(TRANSACTIONS_QUERY_ID)[0]
         return [
-            self.format_metric_string(
-                "Daily Active Addresses",
-                changes["current"],
-                {k: v for k, v in changes.items() if k != "current"},
+            MetricRecord(
+                "Cumulative Stats",
+                ANALYZER_SECTIONS["Cumulative Stats"],
+                latest["cumulative_transactions"],
+                query_id=TRANSACTIONS_QUERY_ID,
+                style="totals",
+                counts=(
+                    ("total transactions", latest["cumulative_transactions"]),
+                    ("total addresses", latest["cu_address_count"]),
+                    ("addresses in last 30d", latest["cu_address_count_30d"]),
+                ),
             )
         ]
 
-    def analyze_tvl(self) -> List[str]:
-        """Total Volume Locked.."""
-        data = pd.DataFrame(self.dune.get_latest_result(4228179).result.rows)
-        lookback_periods = [(1, "1d"), (7, "7d"), (30, "30d"), (90, "90d"), (365, "1y")]
-        changes = self.calculate_changes(data, "tvl", "date", lookback_periods)
-
+    def get_ron_price(self) -> List[MetricRecord]:
+        """RON Price - Current snapshot only."""
+        price = float(self.get_rows(RON_PRICE_QUERY_ID)[0]["ron_price"])
         return [
-            self.format_metric_string(
-                "Total Value Locked (USD)",
-                changes["current"],
-                {k: v for k, v in changes.items() if k != "current"},
+            MetricRecord(
+                "Current RON Price",
+                ANALYZER_SECTIONS["Current RON Price"],
+                price,
+                query_id=RON_PRICE_QUERY_ID,
+                style="price",
             )
         ]
 
-    def analyze_fees(self) -> List[str]:
-        """Protocol Fees"""
-        data = pd.DataFrame(self.dune.get_latest_result(4228192).result.rows)
-        lookback_periods = [(7, "1w"), (30, "1m"), (90, "3m"), (180, "6m"), (365, "1y")]
-        changes = self.calculate_changes(data, "tx_fees_RON", "week", lookback_periods)
+    def _run_analyzer(self, name: str) -> List[MetricRecord]:
+        # A failed query only drops its own metrics
+        try:
+            with instrumentation.span("analyze", analyzer=name):
+                return getattr(self, name)()
+        except Exception as e:
+            print(f"Error running {name}: {str(e)}")
+            return []
 
-        return [
-            self.format_metric_string(
-                "Weekly Protocol Fees (RON)",
-                changes["current"],
-                {k: v for k, v in changes.items() if k != "current"},
-            )
-        ]
+    def _iter_spec_metrics(self) -> Iterator[MetricRecord]:
+        with instrumentation.span("analyze", analyzer="metric_specs"):
+            metrics = self.analyze_metrics(self.metric_specs)
+        for spec in [*self.metric_specs, *self.derived_specs]:
+            if spec.key in metrics:
+                yield metrics[spec.key]
 
-    def analyze_transactions(self) -> List[str]:
-        """Transactions"""
-        data = self.dune.get_latest_result(4228170).result.rows
-        weekly_data = pd.DataFrame(data)
-        lookback_periods = [(7, "1w"), (30, "1m"), (90, "3m"), (180, "6m"), (365, "1y")]
-        changes = self.calculate_changes(
-            weekly_data, "tx_count", "week", lookback_periods
-        )
+    def iter_metrics(self) -> Iterator[MetricRecord]:
+        """
+        Yield metrics as soon as they can be computed.
 
-        latest = data[0]
-        results = [
-            self.format_metric_string(
-                "Weekly Transactions",
-                changes["current"],
-                {k: v for k, v in changes.items() if k != "current"},
-            ),
-            f"Cumulative Stats: {latest['cumulative_transactions']:,.0f} total transactions | "
-            f"{latest['cu_address_count']:,.0f} total addresses | "
-            f"{latest['cu_address_count_30d']:,.0f} addresses in last 30d",
-        ]
+        Analyzers run as their query lands. Metric specs are computed together
+        once all of their queries are in, followed by analyzers that share a
+        query with a spec so each query's metrics stay in order.
+        """
+        analyzers: Dict[int, List[str]] = {}
+        for name, query_id in KNOWLEDGE_BASE_ANALYZERS:
+            analyzers.setdefault(query_id, []).append(name)
+
+        spec_queries = {spec.query_id for spec in self.metric_specs}
+        pending = set(spec_queries)
+        deferred = []
+
+        for query_id in self.iter_prefetch(self.query_ids):
+            for name in analyzers.get(query_id, []):
+                if query_id in spec_queries:
+                    deferred.append(name)
+                else:
+                    yield from self._run_analyzer(name)
+
+            if query_id in pending:
+                pending.discard(query_id)
+                if not pending:
+                    yield from self._iter_spec_metrics()
+                    for name in deferred:
+                        yield from self._run_analyzer(name)
+
+    def ordered_metrics(self, metrics: Iterable[MetricRecord]) -> List[MetricRecord]:
+        """Streamed metrics in knowledge base order, derived indicators last."""
+        position = {query_id: i for i, query_id in enumerate(self.query_ids)}
+        return sorted(metrics, key=lambda m: position.get(m.query_id, len(position)))
+
+    def knowledge_base_metrics(self) -> List[MetricRecord]:
+        """Every metric of the knowledge base, in order."""
+        return self.ordered_metrics(self.iter_metrics())
 
-        return results
+    def generate_knowledge_base(self) -> List[str]:
+        """Generate complete knowledge base."""
+        return [metric.text for metric in self.knowledge_base_metrics()]
+
+
+def get_llm_synthesis(
+    metrics: List[Union[MetricRecord, str]],
+    max_concurrency: int = 4,
+    section_timeout: float = 120.0,
+    max_retries: int = 2,
+    retry_backoff: float = 2.0,
+    cache: Optional[LLMResponseCache] = None,
+    structured: bool = True,
+    router: Optional[SectionRouter] = None,
+) -> List[str]:
+    """
+    Generate concise, Bloomberg-style insights from Ronin metrics.
 
-    def get_ron_price(self) -> List[str]:
-        """RON Price - Current snapshot only."""
-        price = float(self.dune.get_latest_result(4262272).result.rows[0]["ron_price"])
-        return [f"Current RON Price: ${price:.2f}"]
+    Insights are reassembled in section order. See iter_llm_synthesis for the
+    arguments.
+    """
+    records = llm_synthesis_records(
+        metrics,
+        max_concurrency=max_concurrency,
+        section_timeout=section_timeout,
+        max_retries=max_retries,
+        retry_backoff=retry_backoff,
+        cache=cache,
+        structured=structured,
+        router=router,
+    )
+    return [record["text"] for record in records]
+
+
+def llm_synthesis_records(
+    metrics: List[Union[MetricRecord, str]],
+    max_concurrency: int = 4,
+    section_timeout: float = 120.0,
+    max_retries: int = 2,
+    retry_backoff: float = 2.0,
+    cache: Optional[LLMResponseCache] = None,
+    structured: bool = True,
+    router: Optional[SectionRouter] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Insight records from get_llm_synthesis, printed and in section order.
 
-    def analyze_ron_price(self) -> List[str]:
-        """RON Price - Daily historical data."""
-        data = pd.DataFrame(self.dune.get_latest_result(4228181).result.rows)
+    See iter_llm_synthesis for the arguments.
+    """
+    records = sorted(
+        iter_llm_synthesis(
+            metrics,
+            max_concurrency=max_concurrency,
+            section_timeout=section_timeout,
+            max_retries=max_retries,
+            retry_backoff=retry_backoff,
+            cache=cache,
+            structured=structured,
+            router=router,
+        ),
+        key=lambda r: SYNTHESIS_SECTIONS.index(r["section"]),
+    )
 
-        lookback_periods = [(1, "1d"), (7, "7d"), (14, "14d"), (30, "30d")]
+    for record in records:
+        print(record["text"])
 
-        changes = self.calculate_changes(data, "price", "time", lookback_periods)
+    return records
 
-        return [
-            self.format_metric_string(
-                "RON Price (USD)",
-                changes["current"],
-                {k: v for k, v in changes.items() if k != "current"},
-            )
-        ]
 
-    def generate_knowledge_base(self) -> List[str]:
-        """Generate complete knowledge base."""
-        knowledge_base = []
-        knowledge_base.extend(self.get_ron_price())
-        knowledge_base.extend(self.analyze_ron_price())
-        knowledge_base.extend(self.analyze_waa())
-        knowledge_base.extend(self.analyze_daily_addresses())
-        knowledge_base.extend(self.analyze_game_activity())
-        knowledge_base.extend(self.analyze_tvl())
-        knowledge_base.extend(self.analyze_fees())
-        knowledge_base.extend(self.analyze_transactions())
-        return knowledge_base
+def iter_llm_synthesis(
+    metrics: List[Union[MetricRecord, str]],
+    max_concurrency: int = 4,
+    section_timeout: float = 120.0,
+    max_retries: int = 2,
+    retry_backoff: float = 2.0,
+    cache: Optional[LLMResponseCache] = None,
+    structured: bool = True,
+    router: Optional[SectionRouter] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield insight records for each section as soon as it is synthesized.
 
+    In structured mode all sections go out in one request whose response is
+    constrained to insights_schema, so the system instruction is sent once
+    and insights are parsed from JSON instead of filtered line by line. If
+    that request or its parsing fails, sections are synthesized one request
+    each as before.
 
-def get_llm_synthesis(metrics: List[str]) -> List[str]:
-    """Generate concise, Bloomberg-style insights from Ronin metrics."""
+    Args:
+        metrics: Knowledge base metrics, or their formatted lines
+        max_concurrency: Maximum number of sections in flight at once
+        section_timeout: Seconds allowed for each generation request
+        max_retries: Retries per section after a failed request
+        retry_backoff: Base delay in seconds, doubled after each retry
+        cache: Optional response cache that unchanged sections are served from
+        structured: Synthesize all sections in one JSON-schema request
+        router: Assigns formatted lines to sections; by default built from
+            the shipped metric specs. Metric records carry their section.
+    """
 
     system_instruction = """You are a Web3 gaming influencer and data analyst specialized in blockchain gaming ecosystems, particularly Ronin Network. Your expertise spans Web3 gaming analytics, player behavior, tokenomics, and gaming market trends.
 
@@ -272,61 +913,40 @@ def get_llm_synthesis(metrics: List[str]) -> List[str]:
     """
 
     model = genai.GenerativeModel(
-        "gemini-1.5-pro-latest",
+        SYNTHESIS_MODEL,
         system_instruction=system_instruction,
     )
 
+    if router is None:
+        router = default_section_router()
+    routed = router.route(metrics)
+    anomalies: Dict[str, List[str]] = {}
+    for metric in metrics:
+        if isinstance(metric, MetricRecord) and metric.stats and metric.stats.anomalous:
+            anomalies.setdefault(metric.section, []).append(
+                describe_anomaly(metric.name, metric.stats)
+            )
     sections = {
-        "Market": {
-            "data": [m for m in metrics if "RON Price" in m],
-            "context": "Price performance and market dynamics",
-        },
-        "Games": {
-            "data": [
-                m
-                for m in metrics
-                if any(
-                    game in m
-                    for game in [
-                        "Pixel",
-                        "Lumiterra",
-                        "Wild Forest",
-                        "The Machines Arena",
-                        "Axie Infinity",
-                        "Apeiron",
-                        "Pixel HeroZ",
-                        "Ragnarok",
-                        "Kaidro",
-                        "Kongz",
-                    ]
-                )
-            ],
-            "context": "Game-specific performance metrics",
-        },
-        "Users": {
-            "data": [
-                m
-                for m in metrics
-                if any(term in m for term in ["Active Users", "Active Addresses"])
-            ],
-            "context": "Network-wide user activity",
-        },
-        "Economics": {
-            "data": [
-                m
-                for m in metrics
-                if any(term in m for term in ["TVL", "Fees", "Transactions"])
-            ],
-            "context": "Economic indicators and network usage",
-        },
+        section: {
+            "data": routed.get(section, []),
+            "anomalies": anomalies.get(section, []),
+            "context": SECTION_CONTEXT[section],
+        }
+        for section in SYNTHESIS_SECTIONS
     }
 
-    all_insights = []
-
+    prompts = {}
     for section, content in sections.items():
         if not content["data"]:  # Skip empty sections
             continue
 
+        anomaly_block = ""
+        if content["anomalies"]:
+            anomaly_block = f"""
+        Unusual moves against recent history (rolling z-scores), worth calling out:
+        {chr(10).join(content['anomalies'])}
+"""
+
         prompt = f"""Analyze these {section} metrics for the Ronin blockchain in the style of Bloomberg terminal updates. For each metric, provide a single-sentence, data-focused insight that:
         - Leads with the key number and then percentage
         - Includes relevant timeframe comparisons
@@ -337,34 +957,208 @@ def get_llm_synthesis(metrics: List[str]) -> List[str]:
 
         Metrics:
         {chr(10).join(content['data'])}
-
+{anomaly_block}
         Return each insight as a separate line, without quotes, markdown, or array notation. Focus on brevity and impact.
         """
+        prompts[section] = prompt
 
-        try:
-            response = model.generate_content(prompt)
-
-            # Process insights for this section
-            current_time = datetime.now().strftime("%Y-%m-%d %H:%M")
-            section_insights = []
-            for line in response.text.split("\n"):
-                line = line.strip()
-                if line and not any(
-                    x in line.lower()
-                    for x in ["```", "[", "]", "example:", "note:", "analysis:"]
-                ):
-                    line = line.strip("\"'")
-                    insight = f"[{current_time}] [Current Ronin Network State] {line}"
-                    print(insight)
-                    section_insights.append(insight)
-
-            all_insights.extend(section_insights)
+    def generate(
+        section: str,
+        prompt: str,
+        generation_config: Optional[Any] = None,
+    ) -> str:
+        def attempt() -> str:
+            with instrumentation.span("gemini_generate", section=section) as fields:
+                response = model.generate_content(
+                    prompt,
+                    generation_config=generation_config,
+                    request_options={"timeout": section_timeout},
+                )
+                instrumentation.record_token_usage(response, section, fields)
+            return response.text
+
+        return GEMINI_UPSTREAM.call(
+            f"generate_content:{SYNTHESIS_MODEL}",
+            attempt,
+            retries=max_retries,
+            backoff_base=retry_backoff,
+        )
 
+    def synthesize_section(section: str, prompt: str) -> List[str]:
+        with instrumentation.span("synthesize", section=section):
+            return parse_section(section, cached_generate(section, prompt))
+
+    def cached_generate(section: str, prompt: str) -> str:
+        if cache is None:
+            return generate(section, prompt)
+
+        key = LLMResponseCache.make_key(
+            SYNTHESIS_MODEL,
+            system_instruction,
+            section,
+            sections[section]["data"] + sections[section]["anomalies"],
+        )
+        text = cache.get(key)
+        instrumentation.inc(
+            "analytics_llm_cache_total",
+            section=section,
+            outcome="miss" if text is None else "hit",
+        )
+        if text is None:
+            start = time.monotonic()
+            text = generate(section, prompt)
+            cache.put(key, text, time.monotonic() - start)
+        return text
+
+    def parse_section(section: str, text: str) -> List[str]:
+        # Process insights for this section
+        current_time = datetime.now().strftime("%Y-%m-%d %H:%M")
+        section_insights = []
+        for line in text.split("\n"):
+            line = line.strip()
+            if line and not any(
+                x in line.lower()
+                for x in ["```", "[", "]", "example:", "note:", "analysis:"]
+            ):
+                line = line.strip("\"'")
+                insight = f"[{current_time}] [Current Ronin Network State] {line}"
+                section_insights.append(insight)
+
+        return section_insights
+
+    def structured_prompt() -> str:
+        blocks = []
+        for section in prompts:
+            content = sections[section]
+            block = (
+                f"Section: {section}\n"
+                f"Context: {content['context']}\n"
+                f"Metrics:\n{chr(10).join(content['data'])}"
+            )
+            if content["anomalies"]:
+                block += (
+                    "\nUnusual moves against recent history (rolling z-scores):\n"
+                    + "\n".join(content["anomalies"])
+                )
+            blocks.append(block)
+
+        return f"""Analyze these metrics for the Ronin blockchain in the style of Bloomberg terminal updates. For each metric, provide a single-sentence, data-focused insight that:
+        - Leads with the key number and then percentage
+        - Includes relevant timeframe comparisons
+        - Connects to broader ecosystem impact
+        - Maintains professional, analytical tone
+
+        Metrics are grouped by section. Attribute each insight to the section its metric is listed under.
+
+{chr(10).join(blocks)}
+        """
+
+    def parse_structured(text: str) -> List[Dict[str, Any]]:
+        current_time = datetime.now().strftime("%Y-%m-%d %H:%M")
+        records = []
+        for item in json.loads(text)["insights"]:
+            section = item.get("section")
+            insight = item.get("insight")
+            if section not in prompts or not isinstance(insight, str):
+                continue
+            insight = insight.strip()
+            if insight:
+                records.append(
+                    make_record(
+                        "gemini",
+                        "insight",
+                        section,
+                        f"[{current_time}] [Current Ronin Network State] {insight}",
+                    )
+                )
+
+        if not records:
+            raise ValueError("structured response contained no insights")
+        return records
+
+    def synthesize_structured() -> List[Dict[str, Any]]:
+        with instrumentation.span("synthesize", section=STRUCTURED_SECTION):
+            payload = [
+                f"{section}: {line}"
+                for section in prompts
+                for line in sections[section]["data"] + sections[section]["anomalies"]
+            ]
+            key = LLMResponseCache.make_key(
+                SYNTHESIS_MODEL, system_instruction, STRUCTURED_SECTION, payload
+            )
+            text = cache.get(key) if cache is not None else None
+            if cache is not None:
+                instrumentation.inc(
+                    "analytics_llm_cache_total",
+                    section=STRUCTURED_SECTION,
+                    outcome="miss" if text is None else "hit",
+                )
+            if text is not None:
+                return parse_structured(text)
+
+            start = time.monotonic()
+            text = generate(
+                STRUCTURED_SECTION,
+                structured_prompt(),
+                genai.GenerationConfig(
+                    response_mime_type="application/json",
+                    response_schema=insights_schema(list(prompts)),
+                ),
+            )
+            records = parse_structured(text)
+            # Cache only responses that parsed, so a bad one is not replayed
+            if cache is not None:
+                cache.put(key, text, time.monotonic() - start)
+            return records
+
+    if not prompts:
+        return
+
+    if structured:
+        try:
+            records = synthesize_structured()
         except Exception as e:
-            print(f"Error processing {section} section: {str(e)}")
-            continue
+            print(f"Error in structured synthesis, falling back to sections: {str(e)}")
+        else:
+            yield from records
+            return
+
+    with ThreadPoolExecutor(
+        max_workers=max(1, min(max_concurrency, len(prompts)))
+    ) as executor:
+        futures = {
+            executor.submit(synthesize_section, section, prompt): section
+            for section, prompt in prompts.items()
+        }
+
+        for future in as_completed(futures):
+            section = futures[future]
+            try:
+                section_insights = future.result()
+            except Exception as e:
+                print(f"Error processing {section} section: {str(e)}")
+                continue
 
-    return all_insights
+            for insight in section_insights:
+                yield make_record("gemini", "insight", section, insight)
+
+
+def last_run_age(lockfile_path: str) -> Optional[timedelta]:
+    """
+    Time elapsed since the last successful run recorded in the lockfile.
+
+    Returns:
+        Optional[timedelta]: Age of the last run, or None if there is no
+        readable lockfile
+    """
+    try:
+        with open(lockfile_path, "r") as f:
+            data = json.load(f)
+            last_run = datetime.fromisoformat(data["last_run"])
+        return datetime.now() - last_run
+
+    except (json.JSONDecodeError, KeyError, ValueError, FileNotFoundError):
+        return None
 
 
 def should_run(lockfile_path: str, interval_minutes: int = 30) -> bool:
@@ -378,91 +1172,264 @@ def should_run(lockfile_path: str, interval_minutes: int = 30) -> bool:
     Returns:
         bool: True if enough time has passed, False otherwise
     """
-    try:
-        if not os.path.exists(lockfile_path):
-            return True
+    age = last_run_age(lockfile_path)
+    # If there's any error reading the file, assume we should run
+    return age is None or age > timedelta(minutes=interval_minutes)
 
-        with open(lockfile_path, "r") as f:
-            data = json.load(f)
-            last_run = datetime.fromisoformat(data["last_run"])
 
-        # Check if enough time has passed
-        time_passed = datetime.now() - last_run
-        return time_passed > timedelta(minutes=interval_minutes)
+def update_lockfile(lockfile_path: str, insights: List[str]) -> None:
+    """Update the lockfile with current timestamp and insights."""
+    data = {"last_run": datetime.now().isoformat(), "last_data": insights}
 
-    except (json.JSONDecodeError, KeyError, ValueError):
-        # If there's any error reading the file, assume we should run
-        return True
-
-
-def update_lockfile(lockfile_path: str) -> None:
-    """Update the lockfile with current timestamp."""
-    data = {
-        "last_run": datetime.now().isoformat(),
-    }
+    atomic_write_json(lockfile_path, data)
 
-    # Ensure directory exists
-    os.makedirs(os.path.dirname(lockfile_path), exist_ok=True)
 
-    with open(lockfile_path, "w") as f:
-        json.dump(data, f)
+def get_cached_data(lockfile_path: str) -> List[str]:
+    """Retrieve the last successful insights from the lockfile."""
+    try:
+        with open(lockfile_path, "r") as f:
+            data = json.load(f)
+            return data.get("last_data", [])
+    except (json.JSONDecodeError, KeyError, ValueError, FileNotFoundError):
+        return []
 
 
 def rate_limited_main(
-    client: DuneClient, model: genai.GenerativeModel, interval_minutes: int = 30
+    client: DuneClient,
+    model: genai.GenerativeModel,
+    interval_minutes: int = 30,
+    ronin_analytics: Optional[RoninAnalytics] = None,
+    llm_cache: Optional[LLMResponseCache] = None,
+    max_stale_minutes: int = 240,
+    ronin_lock: Optional[threading.Lock] = None,
+    scheduler: Optional[RefreshScheduler] = None,
+    store: Optional[InsightStore] = None,
 ) -> List[str]:
     """
-    Rate-limited version of main function that only runs if enough time has passed.
+    Rate-limited version of main function serving stale-while-revalidate.
+
+    Insights younger than interval_minutes are returned as they are. Older
+    insights are still returned immediately while a refresh runs in the
+    background, until they pass max_stale_minutes; only then, or when no
+    insights have been stored yet, does the caller wait for a full refresh.
+    With a scheduler, insights are instead stale once any Dune query is due
+    on its own adaptive interval, or once they pass max_stale_minutes.
 
     Args:
         client: DuneClient instance
         model: GenerativeModel instance
-        interval_minutes: Minimum minutes between runs
+        interval_minutes: Soft staleness limit, in minutes, before refreshing
+        ronin_analytics: Long-lived RoninAnalytics to reuse, if any
+        llm_cache: Long-lived LLM response cache to reuse, if any
+        max_stale_minutes: Hard staleness limit, in minutes, for serving
+            stored insights
+        ronin_lock: Lock guarding ronin_analytics while a refresh uses it
+        scheduler: Optional per-query refresh schedule replacing
+            interval_minutes; it should be the one ronin_analytics uses
+        store: Optional shared store each refresh's metrics and insights
+            are written to
 
     Returns:
-        List[str]: Analytics insights or empty list if skipped
+        List[str]: Analytics insights, or empty list if none are available
     """
-    # Use a lockfile in the same directory as the script
-    script_dir = Path(__file__).parent
-    lockfile_path = script_dir / ".analytics_lockfile.json"
+    # Use a lockfile in the state directory
+    lockfile_path = str(STATE_DIR / ".analytics_lockfile.json")
+    refresh_lock_path = str(STATE_DIR / ".analytics_lockfile.lock")
 
-    if not should_run(str(lockfile_path), interval_minutes):
-        print(
-            f"Skipping run - less than {interval_minutes} minutes since last execution"
-        )
-        return []
+    def count(outcome: str) -> None:
+        instrumentation.inc("analytics_refresh_total", pipeline="ronin", outcome=outcome)
 
-    try:
-        # Run the main analytics
-        insights = main(client, model)
+    def servable() -> List[str]:
+        age = last_run_age(lockfile_path)
+        if age is None or age > timedelta(minutes=max_stale_minutes):
+            return []
+        return get_cached_data(lockfile_path)
 
-        # Update the lockfile after successful run
-        update_lockfile(str(lockfile_path))
+    def refresh() -> List[str]:
+        try:
+            # Run the main analytics
+            if ronin_lock is None:
+                insights = main(
+                    client, model, ronin_analytics, llm_cache, scheduler, store
+                )
+            else:
+                with ronin_lock:
+                    insights = main(
+                        client, model, ronin_analytics, llm_cache, scheduler, store
+                    )
 
-        return insights
+            # Keep the last good insights if this run produced nothing
+            if not insights:
+                print("Analytics run produced no insights - keeping previous")
+                count("empty")
+                return servable()
 
-    except Exception as e:
-        print(f"Error running analytics: {str(e)}")
-        return []
+            # Update the lockfile after successful run
+            update_lockfile(lockfile_path, insights)
+            count("refreshed")
 
+            return insights
 
-def main(client: DuneClient, model: genai.GenerativeModel):
+        except Exception as e:
+            print(f"Error running analytics: {str(e)}")
+            count("error")
+            return servable()
+
+        finally:
+            instrumentation.export()
+
+    def stale() -> bool:
+        if scheduler is None:
+            return should_run(lockfile_path, interval_minutes)
+        # Sources of queries the pipeline fetches; every known one otherwise
+        sources = None
+        if ronin_analytics is not None:
+            sources = [dune_source(q) for q in ronin_analytics.query_ids]
+        age = last_run_age(lockfile_path)
+        # Adaptive intervals can outgrow the hard limit; insights past it are
+        # no longer served, so they must be refreshed whatever is due
+        if age is None or age > timedelta(minutes=max_stale_minutes):
+            return True
+        return scheduler.any_due(sources)
+
+    cached = servable()
+    if cached:
+        if stale():
+            print("Serving stale insights - refreshing in background")
+            count("stale")
+            refresh_in_background(refresh_lock_path, stale, refresh)
+        elif scheduler is None:
+            print(
+                f"Skipping run - less than {interval_minutes} minutes since last execution"
+            )
+            count("skipped")
+        else:
+            print("Skipping run - no Dune query is due for a refresh")
+            count("skipped")
+        return cached
+
+    # Nothing servable yet: only one process refreshes, the rest wait for it
+    return run_single_flight(refresh_lock_path, stale, refresh, servable)
+
+
+def _pipeline(
+    client: DuneClient,
+    ronin_analytics: Optional[RoninAnalytics],
+    llm_cache: Optional[LLMResponseCache],
+    scheduler: Optional[RefreshScheduler] = None,
+) -> Tuple[RoninAnalytics, LLMResponseCache]:
+    """Fill in the on-disk backed analytics and LLM cache when not supplied."""
+    if ronin_analytics is None:
+        from metric_store import MetricStore
+
+        result_cache = DuneResultCache(client, str(STATE_DIR / ".dune_cache"))
+        metric_store = MetricStore(str(STATE_DIR / ".metric_store"))
+        ronin_analytics = RoninAnalytics(
+            client,
+            result_cache=result_cache,
+            metric_store=metric_store,
+            scheduler=scheduler,
+            metric_stats=MetricStatsEngine(str(STATE_DIR / ".metric_stats.json")),
+            game_history=GameHistory(str(STATE_DIR / ".game_history.json")),
+        )
+    if llm_cache is None:
+        llm_cache = LLMResponseCache(str(STATE_DIR / ".llm_cache.json"))
+    return ronin_analytics, llm_cache
+
+
+def main(
+    client: DuneClient,
+    model: genai.GenerativeModel,
+    ronin_analytics: Optional[RoninAnalytics] = None,
+    llm_cache: Optional[LLMResponseCache] = None,
+    scheduler: Optional[RefreshScheduler] = None,
+    store: Optional[InsightStore] = None,
+):
     # Get Dune analytics insights
-    ronin_analytics = RoninAnalytics(client)
-    metrics = ronin_analytics.generate_knowledge_base()
-    dune_insights = get_llm_synthesis(metrics)
-    return dune_insights
+    ronin_analytics, llm_cache = _pipeline(
+        client, ronin_analytics, llm_cache, scheduler
+    )
+    metrics = ronin_analytics.knowledge_base_metrics()
+    metric_records = [metric.record() for metric in metrics]
+    insight_records = llm_synthesis_records(metrics, cache=llm_cache)
+
+    if store is not None and insight_records:
+        store.write_run("ronin", metric_records + insight_records)
+    return [record["text"] for record in insight_records]
+
+
+def iter_main(
+    client: DuneClient,
+    model: genai.GenerativeModel,
+    ronin_analytics: Optional[RoninAnalytics] = None,
+    llm_cache: Optional[LLMResponseCache] = None,
+    store: Optional[InsightStore] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Streaming version of main.
+
+    Metric records are yielded as each Dune query lands, then insight records
+    as each section is synthesized. Successful insights are stored in the
+    lockfile so rate_limited_main can serve them afterwards, and in store if
+    one is given.
+    """
+    ronin_analytics, llm_cache = _pipeline(client, ronin_analytics, llm_cache)
+
+    metrics, metric_records = [], []
+    for metric in ronin_analytics.iter_metrics():
+        record = metric.record()
+        metrics.append(metric)
+        metric_records.append(record)
+        yield record
+
+    insight_records = []
+    for record in iter_llm_synthesis(
+        ronin_analytics.ordered_metrics(metrics), cache=llm_cache
+    ):
+        insight_records.append(record)
+        yield record
+
+    if insight_records:
+        insight_records.sort(key=lambda r: SYNTHESIS_SECTIONS.index(r["section"]))
+        update_lockfile(
+            str(STATE_DIR / ".analytics_lockfile.json"),
+            [record["text"] for record in insight_records],
+        )
+        if store is not None:
+            store.write_run("ronin", metric_records + insight_records)
 
 
 if __name__ == "__main__":
-    # Initialize Google AI model
-    genai.configure(api_key=GOOGLE_API_KEY)
-    model = genai.GenerativeModel("gemini-1.5-pro-latest")
+    parser = argparse.ArgumentParser(description="Ronin network analytics")
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="run a fresh refresh, emitting each metric and insight as NDJSON",
+    )
+    args = parser.parse_args()
+
+    # Clients are built on first use, so serving cached insights never
+    # imports the Dune and Gemini SDKs
+    model = LazyObject(lambda: genai.GenerativeModel(SYNTHESIS_MODEL))
+
+    def dune_client() -> ResilientDuneClient:
+        from dune_client.client import DuneClient
+
+        return ResilientDuneClient(DuneClient(DUNE_API_KEY))
+
+    client = LazyObject(dune_client)
 
-    # Initialize Dune client
-    client = DuneClient(DUNE_API_KEY)
+    instrumentation.configure_from_env()
+    store = LazyObject(lambda: InsightStore(str(STATE_DIR / ".insights.db")))
 
-    # Run analytics
-    insights = rate_limited_main(client, model)
-    for insight in insights:
-        print(insight)
+    if args.stream:
+        # Keep diagnostic prints off the record stream
+        out = sys.stdout
+        sys.stdout = sys.stderr
+        write_records(iter_main(client, model, store=store), out)
+        instrumentation.export()
+    else:
+        # Run analytics
+        insights = rate_limited_main(client, model, store=store)
+        for insight in insights:
+            print(insight)